@@ -3,4 +3,69 @@ class AdapterValidationError(Exception):
 
 
 class UnexpectedMappingElement(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class StaleIndexError(Exception):
+    pass
+
+
+MISSING_KEY = 'missing_key'
+INCORRECT_TYPE = 'incorrect_type'
+INCORRECT_KEY_TYPE = 'incorrect_key_type'
+EMPTY_VALUE = 'empty_value'
+REQUIRED_WITH = 'required_with'
+UNKNOWN_DISCRIMINATOR = 'unknown_discriminator'
+
+
+class FreeContentKey(str):
+    # key of a free content mapping in error paths, its values are not known by the schema
+    __slots__ = ()
+
+
+class StructuredValidationError(AdapterValidationError):
+    # path is a tuple of keys and collection indexes, types are None where they do not apply
+    def __init__(self, message, kind, path, expected_type=None, actual_type=None):
+        super().__init__(message)
+        self.kind = kind
+        self.path = path
+        self.expected_type = expected_type
+        self.actual_type = actual_type
+
+    def as_dict(self):
+        return {
+            'path': list(self.path),
+            'kind': self.kind,
+            'expected': _get_type_names(self.expected_type),
+            'actual': _get_type_names(self.actual_type),
+            'message': str(self)
+        }
+
+
+def _get_type_names(types):
+    if types is None:
+        return None
+    if isinstance(types, tuple):
+        return [t.__name__ for t in types]
+    return types.__name__
+
+
+class ValidationLimitExceeded(AdapterValidationError):
+    def __init__(self, message, limit, path=()):
+        super().__init__(message)
+        self.limit = limit
+        self.path = path
+
+
+class ShardedValidationError(AdapterValidationError):
+    def __init__(self, failures):
+        super().__init__(failures[0][2])
+        self.failures = failures
+
+
+def get_error_path(error):
+    # "/" separated path of a structured error, collection indexes are written as "[index]"
+    path = getattr(error, 'path', None)
+    if path is None:
+        return ''
+    return '/'.join('[%d]' % segment if isinstance(segment, int) else segment for segment in path)
@@ -1,7 +1,13 @@
 import collections
+import functools
+import time
 from abc import abstractmethod
 
+import metrics
 from errors import AdapterValidationError
+from for_restructuring.changes import ChangeLog
+from for_restructuring.lazy import LazyJSONArray, LazyJSONObject
+from for_restructuring.proxies import CopyOnWriteDict, ProxyDict
 
 
 class AdapterValidated:
@@ -38,6 +44,11 @@ class AdapterInsertTarget:
     def insert_value(self, key, value, owner_instance):
         pass
 
+    def prepare_insert_many(self, items, owner_instance):
+        # has to validate all items up front and return actions applying them, so a batch is applied whole or
+        # not at all; there is no generic way to check items without inserting them
+        raise AdapterValidationError('Insert target "%s" does not support batched inserts' % self.__class__.__name__)
+
 
 class AdapterAttribute(AdapterValidated, AdapterAliased):
     def __init__(self, data_type, required=True, required_with=None, editable=True, **kwargs):
@@ -45,13 +56,15 @@ class AdapterAttribute(AdapterValidated, AdapterAliased):
         AdapterAliased.__init__(self, **kwargs)
         self._data_type = data_type
         self._required = required
-        self._required_with = required_with if required_with else []
+        self._required_with = tuple(required_with) if required_with else ()
         self._editable = editable
 
     def __set_name__(self, owner, name):
         self._name = name
 
     def __get__(self, owner_instance, owner):
+        if metrics.registry is not None:
+            metrics.record_adapter_operation(metrics.registry, metrics.ADAPTER_READS, owner_instance)
         return self._get_raw_value(owner_instance)
 
     def _get_raw_value(self, owner_instance):
@@ -60,7 +73,7 @@ class AdapterAttribute(AdapterValidated, AdapterAliased):
         return raw_value
 
     def _get_owner_instance_raw_data(self, owner_instance):
-        return owner_instance.serialize_to_raw_data()
+        return owner_instance._raw_data
 
     def _validate_raw_value(self, raw_value):
         if self._required and raw_value is None:
@@ -70,7 +83,13 @@ class AdapterAttribute(AdapterValidated, AdapterAliased):
 
     def __set__(self, owner_instance, value):
         self._validate_set_data(value)
-        self._get_owner_instance_raw_data(owner_instance)[self._name] = value
+        raw_data = self._get_owner_instance_raw_data(owner_instance)
+        if owner_instance._change_log is not None:
+            owner_instance._change_log.record_set(owner_instance._json_pointer, self._name, value,
+                                                  self._name in raw_data)
+        raw_data[self._name] = value
+        if metrics.registry is not None:
+            metrics.record_adapter_operation(metrics.registry, metrics.ADAPTER_WRITES, owner_instance)
 
     def _validate_set_data(self, value):
         if not self._editable:
@@ -79,24 +98,68 @@ class AdapterAttribute(AdapterValidated, AdapterAliased):
             raise AdapterValidationError('Attribute requires "%s" data type' % str(self._data_type))
 
     def validate(self, owner_instance):
-        raw_value = self._get_owner_instance_raw_data(owner_instance).get(self._name, None)
+        raw_data = self._get_owner_instance_raw_data(owner_instance)
+        raw_value = raw_data.get(self._name, None)
         self._validate_raw_value(raw_value)
         if raw_value is None:
             return
 
-        required_with = set(self._required_with)
-        for k, _ in self._get_owner_instance_raw_data(owner_instance).items():
-            if k in required_with:
-                required_with.remove(k)
-        if required_with:
-            s = 'Attribute "%s" required together with "%s"' % (self._name, ", ".join([k for k in self._required_with]))
-            raise AdapterValidationError(s)
+        for k in self._required_with:
+            if k not in raw_data:
+                s = 'Attribute "%s" required together with "%s"' % (self._name, ", ".join(self._required_with))
+                raise AdapterValidationError(s)
 
     def search_aliased_adapter(self, target_alias, owner_instance):
         if self.target_alias and self.target_alias == target_alias:
             return self._get_raw_value(owner_instance)
 
 
+_specialized_attribute_classes = {}
+
+
+def _create_specialized_attribute_class(data_type, required, editable):
+    # the fast paths cover the common case, anything else (wrong type, missing value, metrics, change log) goes
+    # the generic way
+    if required:
+        def __get__(self, owner_instance, owner):
+            if metrics.registry is None:
+                value = owner_instance._raw_data.get(self._name)
+                if value.__class__ is data_type:
+                    return value
+            return AdapterAttribute.__get__(self, owner_instance, owner)
+    else:
+        def __get__(self, owner_instance, owner):
+            if metrics.registry is None:
+                value = owner_instance._raw_data.get(self._name)
+                if value is None or value.__class__ is data_type:
+                    return value
+            return AdapterAttribute.__get__(self, owner_instance, owner)
+
+    if editable:
+        def __set__(self, owner_instance, value):
+            if value.__class__ is data_type and metrics.registry is None and owner_instance._change_log is None:
+                owner_instance._raw_data[self._name] = value
+                return
+            AdapterAttribute.__set__(self, owner_instance, value)
+    else:
+        def __set__(self, owner_instance, value):
+            raise AdapterValidationError('Attribute "%s" is not editable' % self._name)
+
+    class_name = '%s%s%sAdapterAttribute' % (data_type.__name__.title(), 'Required' if required else 'Optional',
+                                             'Editable' if editable else 'ReadOnly')
+    return type(class_name, (AdapterAttribute,), {'__get__': __get__, '__set__': __set__})
+
+
+def specialize_attribute(attribute):
+    if type(attribute) is not AdapterAttribute or not isinstance(attribute._data_type, type):
+        return
+    key = (attribute._data_type, bool(attribute._required), bool(attribute._editable))
+    attribute_class = _specialized_attribute_classes.get(key)
+    if attribute_class is None:
+        attribute_class = _specialized_attribute_classes[key] = _create_specialized_attribute_class(*key)
+    attribute.__class__ = attribute_class
+
+
 class AdapterBaseMetaClass(type):
     @classmethod
     def __prepare__(self, name, bases):
@@ -113,6 +176,7 @@ class AdapterBaseMetaClass(type):
         for attr, obj in attrs.items():
             if isinstance(obj, AdapterAttribute):
                 obj.__set_name__(cls, attr)
+                specialize_attribute(obj)
         return cls
 
 
@@ -132,29 +196,50 @@ class AdapterMapped:
 
     def _get_attribute_instance(self, attribute_name, raw_value, owner_instance):
         self._validate_against_mapping(raw_value)
-        attribute_instance = self._mapping[type(raw_value)]
+        attribute_instance = self._mapping[self._get_mapping_type(raw_value)]
         if not isinstance(attribute_instance, AdapterAttribute):
             raise AdapterValidationError('Values in mapping must be instances of AdapterAttribute type')
 
         attribute_instance.__set_name__(owner_instance.__class__, attribute_name)
         return attribute_instance
 
+    def _get_mapping_type(self, raw_value):
+        # lazily decoded and copy-on-write values are mapped as regular dicts and lists
+        if isinstance(raw_value, ProxyDict):
+            return dict
+        if isinstance(raw_value, LazyJSONArray):
+            return list
+        return type(raw_value)
+
     def _validate_against_mapping(self, raw_value):
-        if type(raw_value) not in self._mapping:
+        if self._get_mapping_type(raw_value) not in self._mapping:
             raise AdapterValidationError('Data type not in types mapping')
 
 
 class BaseAdapter(AdapterSearchable, AdapterCompounded, AdapterAliased, AdapterInsertTarget):
-    def __init__(self, raw_data, editable=True, **kwargs):
+    def __init__(self, raw_data, editable=True, change_log=None, json_pointer='', **kwargs):
         self.__dict__['_raw_data'] = raw_data
         self.__dict__['_editable'] = editable
+        self.__dict__['_change_log'] = change_log
+        self.__dict__['_json_pointer'] = json_pointer
+        self.__dict__['_child_adapters'] = {}
         kwargs.pop('searchable', None)
         AdapterCompounded.__init__(self)
         AdapterSearchable.__init__(self, serchable=True, **kwargs)
         AdapterAliased.__init__(self, **kwargs)
         AdapterInsertTarget.__init__(self, **kwargs)
 
+    @classmethod
+    def from_buffer(cls, buffer, **kwargs):
+        return cls(LazyJSONObject(buffer), **kwargs)
+
+    @classmethod
+    def copy_on_write(cls, raw_data, **kwargs):
+        return cls(CopyOnWriteDict(raw_data), **kwargs)
+
     def __getattr__(self, item):
+        if metrics.registry is not None:
+            metrics.record_adapter_operation(metrics.registry, metrics.ADAPTER_SEARCHES, self)
         value = None
         if item in self.source_aliases:
             value = self.search_aliased_adapter(item)
@@ -198,8 +283,111 @@ class BaseAdapter(AdapterSearchable, AdapterCompounded, AdapterAliased, AdapterI
             raise AdapterValidationError('Adapter "%s" is not editable' % self.__class__)
         super().__setattr__(key, value)
 
+    def insert_many(self, items):
+        for action in self.prepare_insert_many(items):
+            action()
+
+    def update_many(self, mapping):
+        self.insert_many(mapping.items())
+
+    def prepare_insert_many(self, items, owner_instance=None):
+        fields = self.get_adapter_fields()
+        own_values = collections.OrderedDict()
+        routed_items = collections.OrderedDict()
+        insert_targets = {}
+        for key, value in items:
+            if key in fields:
+                own_values[key] = value
+                continue
+            target = self._resolve_insert_target(value, insert_targets)
+            if target is None:
+                target = self._get_default_insert_target(key, value)
+            routed_items.setdefault(target, []).append((key, value))
+
+        actions = []
+        if own_values:
+            if not self._editable:
+                raise AdapterValidationError('Adapter "%s" is not editable' % self.__class__)
+            for key, value in own_values.items():
+                fields[key]._validate_set_data(value)
+            actions.append(functools.partial(self._set_raw_values, own_values))
+        for target, target_items in routed_items.items():
+            if target is self:
+                actions.extend(self._prepare_free_content_insert(target_items))
+            else:
+                actions.extend(target.prepare_insert_many(target_items, self))
+        return actions
+
+    def _resolve_insert_target(self, value, insert_targets):
+        # insert targets are resolved once per value type within a batch
+        value_type = type(value)
+        if value_type not in insert_targets:
+            insert_targets[value_type] = None
+            for _, field in self.get_adapter_fields().items():
+                if isinstance(field, AdapterInsertTarget) and field.insertable and isinstance(value, field.insert_type):
+                    insert_targets[value_type] = field
+                    break
+        return insert_targets[value_type]
+
+    def _get_default_insert_target(self, key, value):
+        raise AdapterValidationError('Inserted value not match to any adapter field')
+
+    def _prepare_free_content_insert(self, items):
+        return []
+
+    def _set_raw_values(self, values):
+        raw_data = self._raw_data
+        for key, value in values.items():
+            if self._change_log is not None:
+                self._change_log.record_set(self._json_pointer, key, value, key in raw_data)
+            raw_data[key] = value
+        if metrics.registry is not None:
+            metrics.record_adapter_operation(metrics.registry, metrics.ADAPTER_WRITES, self, len(values))
+
     def serialize_to_raw_data(self):
         return self._raw_data
 
+    def rebind(self, raw_data):
+        # reuses the adapter for another record, the change log of the previous record is not carried over
+        self._rebind(raw_data, None, '')
+        return self
+
+    def _rebind(self, raw_data, change_log, json_pointer):
+        self.__dict__['_raw_data'] = raw_data
+        self.__dict__['_change_log'] = change_log
+        self.__dict__['_json_pointer'] = json_pointer
+        # cached nested adapters of declared fields are kept for reuse but released from the previous record,
+        # the ones of free content keys are dropped, keys differ from record to record
+        fields = self.get_adapter_fields()
+        for name, (_, child_adapter) in list(self._child_adapters.items()):
+            if name in fields:
+                child_adapter._rebind(None, None, '')
+            else:
+                del self._child_adapters[name]
+
+    def track_changes(self):
+        # mutations made from now on through this adapter and the nested ones are recorded as a JSON Patch
+        if self._change_log is None:
+            self.__dict__['_change_log'] = ChangeLog()
+        return self._change_log
+
+    def freeze(self):
+        from for_restructuring.frozen import freeze_adapter
+        return freeze_adapter(self)
+
     def validate(self, owner_instance=None):
-        super().validate(self)
\ No newline at end of file
+        metrics_registry = metrics.registry
+        if metrics_registry is None:
+            return self._validate_adapter()
+
+        labels = (('adapter', self.__class__.__name__),)
+        started = time.perf_counter()
+        try:
+            self._validate_adapter()
+        except AdapterValidationError as e:
+            metrics.record_validation(metrics_registry, time.perf_counter() - started, labels, e, adapter=True)
+            raise
+        metrics.record_validation(metrics_registry, time.perf_counter() - started, labels, adapter=True)
+
+    def _validate_adapter(self):
+        AdapterCompounded.validate(self, self)
\ No newline at end of file
@@ -0,0 +1,55 @@
+import collections
+
+from for_restructuring.proxies import materialize
+
+ADD = 'add'
+REPLACE = 'replace'
+
+
+def escape_pointer_token(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def join_pointer(pointer, token):
+    return '%s/%s' % (pointer, escape_pointer_token(token))
+
+
+class ChangeLog:
+    # mutations made through editable adapters as (operation, JSON Pointer, value) since the last checkpoint
+    def __init__(self):
+        self._operations = []
+
+    def __len__(self):
+        return len(self._operations)
+
+    def record_set(self, pointer, key, value, existed):
+        self._operations.append((REPLACE if existed else ADD, join_pointer(pointer, key), value))
+
+    def checkpoint(self):
+        self._operations = []
+
+    def get_patch(self):
+        # RFC 6902 patch, a write overrides earlier writes of the same path and of everything below it;
+        # written paths are kept in a tree of pointer tokens, so paths below a write are found without a scan
+        operations = collections.OrderedDict()
+        written = {}
+        for op, path, value in self._operations:
+            node = written
+            for token in path.split('/')[1:]:
+                node = node.setdefault(token, {})
+            _discard_paths_below(node, path, operations)
+            previous = operations.pop(path, None)
+            if previous is not None and previous[0] == ADD:
+                op = ADD
+            operations[path] = (op, value)
+        return [{'op': op, 'path': path, 'value': materialize(value)} for path, (op, value) in operations.items()]
+
+
+def _discard_paths_below(node, path, operations):
+    # every node is discarded at most once after it was added, so building a patch stays linear
+    stack = [(child, path + '/' + token) for token, child in node.items()]
+    while stack:
+        child, child_path = stack.pop()
+        operations.pop(child_path, None)
+        stack.extend((grandchild, child_path + '/' + token) for token, grandchild in child.items())
+    node.clear()
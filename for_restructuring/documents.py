@@ -0,0 +1,105 @@
+import collections
+
+from for_restructuring.relationships import get_linkage, get_linkage_keys, get_raw_resource, get_relationships, \
+    get_resource_key
+from for_restructuring.serializers import DEFAULT_BUFFER_SIZE, StreamingSerializer
+
+# members of a resource object which are kept whatever the sparse fieldset is
+RESOURCE_IDENTIFICATION_MEMBERS = ('type', 'id', 'links')
+
+
+def parse_fieldsets(fields):
+    # fields maps types to "a,b" strings or lists of member names, as parsed from fields[TYPE] query parameters
+    fieldsets = {}
+    for resource_type, type_fields in (fields or {}).items():
+        if isinstance(type_fields, str):
+            type_fields = type_fields.split(',')
+        fieldsets[resource_type] = frozenset(f.strip() for f in type_fields if f.strip())
+    return fieldsets
+
+
+class CompoundDocumentBuilder:
+    # builds a JSON:API document of primary resources and the targets of their relationships in "included",
+    # targets are loaded in one batch by the resolver and deduplicated by their (type, id) key
+    def __init__(self, resolver=None, include=None, fields=None):
+        self._resolver = resolver
+        self._include = list(include) if include is not None else None
+        self._fieldsets = parse_fieldsets(fields)
+        self._resources = []
+        self._resource_keys = set()
+        self._included = None
+
+    def add(self, resource):
+        # the adapted data is kept as it is, values of lazily decoded resources are written from their buffer
+        resource = get_raw_resource(resource)
+        self._resources.append(resource)
+        self._resource_keys.add(get_resource_key(resource))
+        self._included = None
+
+    def add_many(self, resources):
+        for resource in resources:
+            self.add(resource)
+
+    def get_included(self):
+        if self._included is None:
+            self._included = self._collect_included()
+        return list(self._included.values())
+
+    def _collect_included(self):
+        included = collections.OrderedDict()
+        if self._resolver is None:
+            return included
+        self._resolver.collect(self._resources, self._include)
+        self._resolver.load()
+        cache = self._resolver.cache
+        for resource in self._resources:
+            relationships = get_relationships(resource)
+            for name in (self._include if self._include is not None else relationships.keys()):
+                for key in get_linkage_keys(get_linkage(relationships, name)):
+                    # a resource is written once, either as primary data or as included
+                    if key in self._resource_keys or key in included:
+                        continue
+                    target = cache.get(key)
+                    if target is not None:
+                        included[key] = get_raw_resource(target)
+        return included
+
+    def apply_fieldset(self, resource):
+        fieldset = self._fieldsets.get(resource.get('type', None))
+        if fieldset is None:
+            return resource
+        selected = collections.OrderedDict()
+        for member in RESOURCE_IDENTIFICATION_MEMBERS:
+            if resource.get(member, None) is not None:
+                selected[member] = resource[member]
+        for member in ('attributes', 'relationships'):
+            values = resource.get(member, None)
+            if not values:
+                continue
+            selected_values = collections.OrderedDict((k, values[k]) for k in values.keys() if k in fieldset)
+            if selected_values:
+                selected[member] = selected_values
+        return selected
+
+    def write(self, fp, buffer_size=DEFAULT_BUFFER_SIZE, single=False):
+        # resources are written one by one, only their sparse fieldset copies exist at a time
+        serializer = StreamingSerializer(fp, buffer_size)
+        serializer.write_bytes(b'{"data":')
+        if single:
+            serializer.write(self.apply_fieldset(self._resources[0]) if self._resources else None)
+        else:
+            self._write_resources(serializer, self._resources)
+        included = self.get_included()
+        if included:
+            serializer.write_bytes(b',"included":')
+            self._write_resources(serializer, included)
+        serializer.write_bytes(b'}')
+        serializer.flush()
+
+    def _write_resources(self, serializer, resources):
+        serializer.write_bytes(b'[')
+        for index, resource in enumerate(resources):
+            if index:
+                serializer.write_bytes(b',')
+            serializer.write(self.apply_fieldset(resource))
+        serializer.write_bytes(b']')
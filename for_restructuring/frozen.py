@@ -0,0 +1,121 @@
+import sys
+import types
+import weakref
+
+from for_restructuring.base import AdapterSearchable
+from for_restructuring.mixture import AdapterFreeContent, AdapterFreeTypeAttribute, AdapterObjectAttribute, \
+    AdapterObjectFreeContentAttribute
+
+# record classes are generated once per adapter class and per object attribute class for nested objects
+_record_classes = weakref.WeakKeyDictionary()
+
+
+class FrozenRecord:
+    __slots__ = ('_free_content',)
+    _searchable_fields = ()
+
+    def __getattr__(self, item):
+        free_content = object.__getattribute__(self, '_free_content')
+        if free_content is not None and item in free_content:
+            return free_content[item]
+        for name in self._searchable_fields:
+            child = object.__getattribute__(self, name)
+            if not isinstance(child, FrozenRecord):
+                continue
+            try:
+                value = getattr(child, item)
+            except AttributeError:
+                continue
+            if value:
+                return value
+        raise AttributeError(item)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Frozen record "%s" cannot be modified' % self.__class__.__name__)
+
+    def __delattr__(self, item):
+        raise AttributeError('Frozen record "%s" cannot be modified' % self.__class__.__name__)
+
+    def to_raw_data(self):
+        raw_data = {}
+        for name in self.__slots__:
+            value = object.__getattribute__(self, name)
+            if value is not None:
+                raw_data[name] = _thaw_value(value)
+        if self._free_content is not None:
+            for k, v in self._free_content.items():
+                raw_data[k] = _thaw_value(v)
+        return raw_data
+
+
+def _get_record_class(adapter_class, fields):
+    record_class = _record_classes.get(adapter_class)
+    if record_class is None:
+        searchable_fields = tuple(n for n, f in fields.items() if isinstance(f, AdapterSearchable) and f.searchable)
+        record_class = type('%sRecord' % adapter_class.__name__, (FrozenRecord,), {
+            '__slots__': tuple(sys.intern(n) for n in fields),
+            '_searchable_fields': searchable_fields
+        })
+        _record_classes[adapter_class] = record_class
+    return record_class
+
+
+def _build_record(record_class, fields, raw_data, mapping_owner):
+    record = object.__new__(record_class)
+    for name, field in fields.items():
+        object.__setattr__(record, name, _freeze_field(field, raw_data.get(name, None)))
+
+    free_content = None
+    if mapping_owner is not None:
+        free_content = {}
+        for k, v in raw_data.items():
+            if k not in fields and v is not None:
+                free_content[sys.intern(k)] = _freeze_mapped_value(mapping_owner, v)
+    object.__setattr__(record, '_free_content', free_content)
+    return record
+
+
+def _freeze_mapped_value(mapping_owner, raw_value):
+    attribute_instance = mapping_owner._mapping.get(mapping_owner._get_mapping_type(raw_value))
+    if attribute_instance is None:
+        return freeze_value(raw_value)
+    return _freeze_field(attribute_instance, raw_value)
+
+
+def _freeze_field(field, raw_value):
+    if raw_value is None:
+        return None
+    if isinstance(field, AdapterObjectAttribute):
+        fields = field.get_adapter_fields()
+        record_class = _get_record_class(field.__class__, fields)
+        mapping_owner = field if isinstance(field, AdapterObjectFreeContentAttribute) else None
+        return _build_record(record_class, fields, raw_value, mapping_owner)
+    if isinstance(field, AdapterFreeTypeAttribute):
+        return _freeze_mapped_value(field, raw_value)
+    return freeze_value(raw_value)
+
+
+def freeze_value(value):
+    if isinstance(value, dict):
+        return types.MappingProxyType({sys.intern(k): freeze_value(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_value(v) for v in value)
+    return value
+
+
+def _thaw_value(value):
+    if isinstance(value, FrozenRecord):
+        return value.to_raw_data()
+    if isinstance(value, types.MappingProxyType):
+        return {k: _thaw_value(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw_value(v) for v in value]
+    return value
+
+
+def freeze_adapter(adapter):
+    # the adapted data is expected to be validated already, frozen records do no type checks on access
+    fields = adapter.get_adapter_fields()
+    record_class = _get_record_class(adapter.__class__, fields)
+    mapping_owner = adapter if isinstance(adapter, AdapterFreeContent) else None
+    return _build_record(record_class, fields, adapter.serialize_to_raw_data(), mapping_owner)
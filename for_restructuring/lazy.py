@@ -0,0 +1,468 @@
+import json
+import re
+
+from errors import AdapterValidationError
+from for_restructuring.proxies import ProxyDict
+
+_WHITESPACE = b' \t\n\r'
+_OBJECT_START = ord('{')
+_OBJECT_END = ord('}')
+_ARRAY_START = ord('[')
+_ARRAY_END = ord(']')
+_QUOTE = ord('"')
+_COMMA = ord(',')
+
+# buffers are scanned in a masked copy of the same length: escaped backslashes and quotes are blanked,
+# so every quote left delimits a string and strings are skipped without looking for escapes
+_ESCAPE_RE = re.compile(rb'\\.', re.DOTALL)
+_MASKED_KEY_RE = re.compile(rb'[ \t\n\r]*+("[^"]*+")[ \t\n\r]*+:[ \t\n\r]*+')
+_MASKED_MEMBER_SEPARATOR_RE = re.compile(rb'[ \t\n\r]*+([,}])')
+_MASKED_ITEM_SEPARATOR_RE = re.compile(rb'[ \t\n\r]*+([,\]])')
+_MASKED_SCALAR_RE = re.compile(rb'[^ \t\n\r,:\[\]{}"]++')
+_MASKED_TOKEN_RE = re.compile(rb'"[^"]*+"?|[\[\]{}]')
+# containers nested up to this depth are skipped by a single regular expression match,
+# deeper ones token by token
+SKIPPED_DEPTH = 8
+ARRAY_WINDOW_SIZE = 1024 * 1024
+SCAN_WINDOW_SIZE = 64 * 1024
+
+
+_MASKED_CONTENT = rb'[^"\[\]{}]*+(?:"[^"]*+"[^"\[\]{}]*+)*+'
+
+
+def _create_masked_container_re(depth):
+    container = rb'[\[{]' + _MASKED_CONTENT + rb'[\]}]'
+    for _ in range(depth - 1):
+        container = rb'[\[{]' + _MASKED_CONTENT + rb'(?:' + container + _MASKED_CONTENT + rb')*+[\]}]'
+    return re.compile(container)
+
+
+_MASKED_CONTAINER_RE = _create_masked_container_re(SKIPPED_DEPTH)
+# values of a container up to the first bracket or quote it does not close, e.g. of an item cut by a window
+_MASKED_BALANCED_RE = re.compile(_MASKED_CONTENT + rb'(?:' + _MASKED_CONTAINER_RE.pattern + _MASKED_CONTENT + rb')*+')
+_MASKED_SCALAR_TAIL_RE = re.compile(rb'[^ \t\n\r,:\[\]{}"]*+[ \t\n\r]*+')
+# an item with its separator, items are matched one after another while they follow each other directly
+_MASKED_ITEM_RE = re.compile(rb'[ \t\n\r]*+(' + _MASKED_CONTAINER_RE.pattern +
+                             rb'|"[^"]*+"|[^ \t\n\r,:\[\]{}"]++)[ \t\n\r]*+([,\]])')
+
+
+def skip_whitespace(buffer, pos, end):
+    while pos < end and buffer[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def mask_buffer(buffer, start, end):
+    masked = bytes(buffer[start:end])
+    if b'\\' in masked:
+        masked = _ESCAPE_RE.sub(b'__', masked)
+    return masked
+
+
+def decode_key(raw_key):
+    if b'\\' in raw_key:
+        return json.loads(raw_key)
+    return raw_key[1:-1].decode('utf-8')
+
+
+def _skip_masked_container(masked, pos, end):
+    match = _MASKED_CONTAINER_RE.match(masked, pos, end)
+    if match is not None:
+        return match.end()
+    depth = 0
+    for match in _MASKED_TOKEN_RE.finditer(masked, pos, end):
+        token = masked[match.start()]
+        if token == _QUOTE and (match.end() - match.start() < 2 or masked[match.end() - 1] != _QUOTE):
+            # a string cut by the end of a window
+            return None
+        if token == _OBJECT_START or token == _ARRAY_START:
+            depth += 1
+        elif token == _OBJECT_END or token == _ARRAY_END:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
+
+
+def _skip_masked_value(masked, pos, end):
+    # returns the end of the value starting at pos, None if it does not end before end
+    if pos >= end:
+        return None
+    first = masked[pos]
+    if first == _OBJECT_START or first == _ARRAY_START:
+        return _skip_masked_container(masked, pos, end)
+    if first == _QUOTE:
+        value_end = masked.find(b'"', pos + 1, end)
+        return value_end + 1 if value_end != -1 else None
+    match = _MASKED_SCALAR_RE.match(masked, pos, end)
+    return match.end() if match is not None else None
+
+
+def find_value_end(buffer, start, end, window_size=SCAN_WINDOW_SIZE):
+    # end of the value starting at buffer[start], None if it does not end before end;
+    # the buffer is masked in growing windows, so only about the value itself is copied
+    while True:
+        window_end = min(start + window_size, end)
+        masked = mask_buffer(buffer, start, window_end)
+        value_end = _skip_masked_value(masked, 0, len(masked))
+        if window_end == end:
+            return start + value_end if value_end is not None else None
+        # a scalar running up to the end of the window may go on behind it
+        if value_end is not None and value_end < len(masked):
+            return start + value_end
+        window_size *= 2
+
+
+class ObjectScanner:
+    # scans members of the object starting at buffer[start] == '{' one at a time, masking the buffer window by
+    # window; the caller may give the end of a value it found itself, other values are skipped over here
+    def __init__(self, buffer, start, end, window_size=SCAN_WINDOW_SIZE):
+        self._buffer = buffer
+        self._end = end
+        self._window_size = window_size
+        self._window_start = start
+        self._masked = mask_buffer(buffer, start, min(start + window_size, end))
+        self._pos = skip_whitespace(self._masked, 1, len(self._masked))
+        self._value_start = None
+        self.object_end = None
+        if self._pos < len(self._masked) and self._masked[self._pos] == _OBJECT_END:
+            self.object_end = start + self._pos + 1
+
+    def _mask_window(self, start):
+        self._window_start = start
+        self._masked = mask_buffer(self._buffer, start, min(start + self._window_size, self._end))
+        self._pos = 0
+
+    def _is_last_window(self):
+        return self._window_start + len(self._masked) >= self._end
+
+    def next_member(self):
+        # returns (key, value_start) of the next member, None when the object ended
+        if self.object_end is not None:
+            return None
+        while True:
+            match = _MASKED_KEY_RE.match(self._masked, self._pos)
+            if match is not None and match.end() < len(self._masked):
+                break
+            if self._is_last_window():
+                raise AdapterValidationError('Incorrect object in adapted buffer')
+            self._window_size *= 2
+            self._mask_window(self._window_start + self._pos)
+        key_start, key_end = match.span(1)
+        key = decode_key(bytes(self._buffer[self._window_start + key_start:self._window_start + key_end]))
+        self._value_start = self._window_start + match.end()
+        return key, self._value_start
+
+    def skip_value(self, value_end=None):
+        # moves behind the value of the last member and its separator, returns the end of the value
+        if value_end is None:
+            relative_end = _skip_masked_value(self._masked, self._value_start - self._window_start,
+                                              len(self._masked))
+            if relative_end is not None and (relative_end < len(self._masked) or self._is_last_window()):
+                value_end = self._window_start + relative_end
+            else:
+                value_end = find_value_end(self._buffer, self._value_start, self._end)
+                if value_end is None:
+                    raise AdapterValidationError('Unterminated object in adapted buffer')
+        separator = None
+        if value_end < self._window_start + len(self._masked):
+            separator = _MASKED_MEMBER_SEPARATOR_RE.match(self._masked, value_end - self._window_start)
+        if separator is None and not self._is_last_window():
+            self._mask_window(value_end)
+            separator = _MASKED_MEMBER_SEPARATOR_RE.match(self._masked, 0)
+        if separator is None:
+            raise AdapterValidationError('Unterminated object in adapted buffer')
+        self._pos = separator.end()
+        if self._masked[self._pos - 1] == _OBJECT_END:
+            self.object_end = self._window_start + self._pos
+        return value_end
+
+
+def scan_array_items(buffer, pos, end, window_size=ARRAY_WINDOW_SIZE):
+    # yields (item_start, item_end, next_position) for items of an array,
+    # pos points just behind the opening bracket or behind a comma separating items;
+    # the buffer is masked window by window, so huge arrays are not copied as a whole, and items are matched
+    # only as they are asked for; an item running past the window is left for the next one
+    while True:
+        window_end = min(pos + window_size, end)
+        masked = mask_buffer(buffer, pos, window_end)
+        masked_end = len(masked)
+        relative = 0
+        item_start = skip_whitespace(masked, 0, masked_end)
+        if item_start < masked_end and masked[item_start] == _ARRAY_END:
+            return
+        while True:
+            for match in _MASKED_ITEM_RE.finditer(masked, relative):
+                if match.start() != relative:
+                    break
+                relative = match.end()
+                yield pos + match.start(1), pos + match.end(1), pos + relative
+                if masked[relative - 1] == _ARRAY_END:
+                    return
+            # containers nested too deep for the regular expression, and the item at the end of the window
+            item_start = skip_whitespace(masked, relative, masked_end)
+            item_end = _skip_masked_value(masked, item_start, masked_end)
+            separator = _MASKED_ITEM_SEPARATOR_RE.match(masked, item_end, masked_end) if item_end is not None \
+                else None
+            if separator is None:
+                break
+            relative = separator.end()
+            yield pos + item_start, pos + item_end, pos + relative
+            if masked[relative - 1] == _ARRAY_END:
+                return
+        if window_end == end:
+            raise AdapterValidationError('Unterminated array in adapted buffer')
+        if not relative:
+            window_size *= 2
+        pos += relative
+
+
+def split_array_items(buffer, pos, end, size):
+    # returns positions of items of the array about size bytes apart and the end of the array; pos points just
+    # behind the opening bracket, the other positions just behind a comma; a window of size bytes is masked and
+    # matched up to the first item it does not close, so only the items under the cuts are skipped over
+    # one by one and the array is never masked as a whole
+    item_start = skip_whitespace(buffer, pos, end)
+    if item_start < end and buffer[item_start] == _ARRAY_END:
+        return [], item_start + 1
+    positions = []
+    while True:
+        positions.append(pos)
+        window_end = min(pos + size, end)
+        masked = mask_buffer(buffer, pos, window_end)
+        stop = _MASKED_BALANCED_RE.match(masked).end()
+        if stop < len(masked) and masked[stop] == _ARRAY_END:
+            return positions, pos + stop + 1
+        if stop < len(masked) and masked[stop] == _OBJECT_END:
+            raise AdapterValidationError('Incorrect array in adapted buffer')
+        if stop == len(masked) and window_end == end:
+            raise AdapterValidationError('Unterminated array in adapted buffer')
+        # the next range starts behind the comma before the item under the cut
+        cut = stop
+        while cut and masked[cut - 1] in _WHITESPACE:
+            cut -= 1
+        if cut and masked[cut - 1] == _COMMA:
+            pos += cut
+            continue
+        if stop < len(masked) or not cut:
+            # the first item of the window does not end in it
+            item_end = find_value_end(buffer, skip_whitespace(buffer, pos, end), end, size)
+            if item_end is None:
+                raise AdapterValidationError('Unterminated array in adapted buffer')
+        else:
+            # the window ends within a scalar item or in whitespace behind an item
+            item_end = pos + stop
+        tail = mask_buffer(buffer, item_end, min(item_end + SCAN_WINDOW_SIZE, end))
+        separator = _MASKED_SCALAR_TAIL_RE.match(tail).end()
+        if separator < len(tail) and tail[separator] == _ARRAY_END:
+            return positions, item_end + separator + 1
+        if separator == len(tail) or tail[separator] != _COMMA:
+            raise AdapterValidationError('Unterminated array in adapted buffer')
+        pos = item_end + separator + 1
+
+
+def decode_value(buffer, start, end):
+    start = skip_whitespace(buffer, start, end)
+    if start < end and buffer[start] == _OBJECT_START:
+        return LazyJSONObject(buffer, start, end)
+    if start < end and buffer[start] == _ARRAY_START:
+        return LazyJSONArray(buffer, start, end)
+    return json.loads(bytes(buffer[start:end]))
+
+
+def _scanning_all(name):
+    method = getattr(list, name)
+
+    def scanning_all(self, *args, **kwargs):
+        self._scan_all()
+        return method(self, *args, **kwargs)
+    scanning_all.__name__ = name
+    return scanning_all
+
+
+class LazyJSONArray(list):
+    # items are scanned only up to the one read, objects become lazy objects and the other items are decoded;
+    # scanned items are kept in the list itself, so like in ProxyDict every list method goes through the rest
+    # of the array, which is scanned first
+    def __init__(self, buffer, start, end):
+        super().__init__()
+        self._buffer = buffer
+        self._items = scan_array_items(buffer, start + 1, end, SCAN_WINDOW_SIZE)
+
+    def _scan_item(self):
+        # scans one more item, False when the array has been scanned whole
+        if self._items is None:
+            return False
+        for item_start, item_end, _ in self._items:
+            if self._buffer[item_start] == _OBJECT_START:
+                list.append(self, LazyJSONObject._from_span(self._buffer, item_start, item_end))
+            else:
+                list.append(self, json.loads(bytes(self._buffer[item_start:item_end])))
+            return True
+        self._items = None
+        return False
+
+    def _scan_all(self):
+        while self._scan_item():
+            pass
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index >= 0:
+            while index >= list.__len__(self) and self._scan_item():
+                pass
+        else:
+            self._scan_all()
+        return list.__getitem__(self, index)
+
+    def __iter__(self):
+        index = 0
+        while index < list.__len__(self) or self._scan_item():
+            yield list.__getitem__(self, index)
+            index += 1
+
+    def __bool__(self):
+        return list.__len__(self) > 0 or self._scan_item()
+
+    def __radd__(self, other):
+        self._scan_all()
+        return other + list(self)
+
+    __len__ = _scanning_all('__len__')
+    __contains__ = _scanning_all('__contains__')
+    __reversed__ = _scanning_all('__reversed__')
+    __setitem__ = _scanning_all('__setitem__')
+    __delitem__ = _scanning_all('__delitem__')
+    __eq__ = _scanning_all('__eq__')
+    __ne__ = _scanning_all('__ne__')
+    __lt__ = _scanning_all('__lt__')
+    __le__ = _scanning_all('__le__')
+    __gt__ = _scanning_all('__gt__')
+    __ge__ = _scanning_all('__ge__')
+    __add__ = _scanning_all('__add__')
+    __iadd__ = _scanning_all('__iadd__')
+    __mul__ = _scanning_all('__mul__')
+    __rmul__ = _scanning_all('__rmul__')
+    __imul__ = _scanning_all('__imul__')
+    __repr__ = _scanning_all('__repr__')
+    append = _scanning_all('append')
+    extend = _scanning_all('extend')
+    insert = _scanning_all('insert')
+    pop = _scanning_all('pop')
+    remove = _scanning_all('remove')
+    clear = _scanning_all('clear')
+    copy = _scanning_all('copy')
+    count = _scanning_all('count')
+    index = _scanning_all('index')
+    reverse = _scanning_all('reverse')
+    sort = _scanning_all('sort')
+
+
+class LazyJSONObject(ProxyDict):
+    # values are decoded on first access, nested objects become lazy objects themselves,
+    # so only the subtrees which are actually read get decoded; members are scanned only up to the one read,
+    # the value of the last one scanned is skipped over when the scan goes on
+    def __init__(self, buffer, start=0, end=None, index=None):
+        super().__init__()
+        if not isinstance(buffer, memoryview):
+            buffer = memoryview(buffer)
+        end = len(buffer) if end is None else end
+        start = skip_whitespace(buffer, start, end)
+        if start >= end or buffer[start] != _OBJECT_START:
+            raise AdapterValidationError('Adapted buffer does not contain a JSON object')
+        self._buffer = buffer
+        self._start = start
+        self._end = end
+        # {key: (value_start, value_end)}, the end is None for the last member scanned so far
+        self._index = {} if index is None else index
+        self._scanned = index is not None
+
+    _scanner = None
+    _scanned = False
+    _pending_key = None
+
+    @classmethod
+    def _from_span(cls, buffer, start, end):
+        # an object at a known span of a memoryview, as the items of an array are created in bulk
+        value = cls.__new__(cls)
+        ProxyDict.__init__(value)
+        value._buffer = buffer
+        value._start = start
+        value._end = end
+        value._index = {}
+        return value
+
+    def _scan_member(self):
+        # scans one more member, False when the object has been scanned whole
+        if self._scanned:
+            return False
+        if self._scanner is None:
+            self._scanner = ObjectScanner(self._buffer, self._start, self._end)
+        if self._pending_key is not None:
+            self._close_pending()
+        member = self._scanner.next_member()
+        if member is None:
+            self._end = self._scanner.object_end
+            self._scanner = None
+            self._scanned = True
+            return False
+        key, value_start = member
+        self._index[key] = (value_start, None)
+        self._pending_key = key
+        return True
+
+    def _close_pending(self):
+        key = self._pending_key
+        value_start, value_end = self._index[key]
+        self._index[key] = (value_start, self._scanner.skip_value(value_end))
+        self._pending_key = None
+
+    def _get_index(self):
+        while self._scan_member():
+            pass
+        return self._index
+
+    def _find_span(self, key):
+        span = self._index.get(key)
+        while span is None and self._scan_member():
+            span = self._index.get(key)
+        if span is not None and span[1] is None:
+            self._close_pending()
+            span = self._index[key]
+        return span
+
+    def raw_span(self, key):
+        # offsets of a value that has not been decoded or modified, None otherwise
+        if dict.__contains__(self, key):
+            return None
+        return self._find_span(key)
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    def _load(self, key):
+        span = self._index.get(key)
+        while span is None and self._scan_member():
+            span = self._index.get(key)
+        if span is None:
+            raise KeyError(key)
+        value_start, value_end = span
+        if value_end is None and self._buffer[value_start] == _ARRAY_START:
+            # containers are scanned lazily themselves, the end of the last member is only looked for
+            # when the scan goes on
+            return LazyJSONArray(self._buffer, value_start, self._end)
+        if value_end is None and self._buffer[value_start] == _OBJECT_START:
+            return LazyJSONObject(self._buffer, value_start, self._end)
+        if value_end is None:
+            self._close_pending()
+            value_end = self._index[key][1]
+        return decode_value(self._buffer, value_start, value_end)
+
+    def _source_keys(self):
+        return self._get_index().keys()
+
+    def _source_contains(self, key):
+        return self._find_span(key) is not None
+
+    def _discard_source_key(self, key):
+        self._get_index().pop(key, None)
@@ -1,6 +1,11 @@
+import collections
+import functools
+
+import metrics
 from errors import AdapterValidationError
 from for_restructuring.base import AdapterAttribute, AdapterSearchable, AdapterMapped, BaseAdapter, AdapterCompounded, AdapterValidated, \
     AdapterAliased, AdapterInsertTarget
+from for_restructuring.changes import join_pointer
 
 
 class AdapterObjectAttribute(AdapterAttribute, AdapterCompounded, AdapterSearchable, AdapterAliased, AdapterInsertTarget):
@@ -13,14 +18,32 @@ class AdapterObjectAttribute(AdapterAttribute, AdapterCompounded, AdapterSearcha
         AdapterInsertTarget.__init__(self, **kwargs)
 
     def __get__(self, owner_instance, owner):
+        if metrics.registry is not None:
+            metrics.record_adapter_operation(metrics.registry, metrics.ADAPTER_READS, owner_instance)
         return self._create_field_adapter_instance(owner_instance)
 
     def _create_field_adapter_instance(self, owner_instance):
         raw_value = self._get_raw_value(owner_instance)
         if raw_value is None:
             return
+        change_log = owner_instance._change_log
+        json_pointer = join_pointer(owner_instance._json_pointer, self._name) if change_log is not None else ''
+
+        # nested adapters are created once per owner adapter and rebound when their data changes
+        cached = owner_instance._child_adapters.get(self._name)
+        if cached is not None and cached[0] is self:
+            adapter_instance = cached[1]
+            if adapter_instance._raw_data is not raw_value or adapter_instance._change_log is not change_log:
+                adapter_instance._rebind(raw_value, change_log, json_pointer)
+            return adapter_instance
+
         adapter_class = self._create_adapter_class(self._name)
-        return adapter_class(**self._get_adapter_instance_params(raw_value))
+        kwargs = self._get_adapter_instance_params(raw_value)
+        if change_log is not None:
+            kwargs.update({'change_log': change_log, 'json_pointer': json_pointer})
+        adapter_instance = adapter_class(**kwargs)
+        owner_instance._child_adapters[self._name] = (self, adapter_instance)
+        return adapter_instance
 
     def _create_adapter_class(self, name):
         class_name = '%sAdapterType' % name.lower().title()
@@ -77,6 +100,12 @@ class AdapterObjectAttribute(AdapterAttribute, AdapterCompounded, AdapterSearcha
         if adapter_instance and isinstance(adapter_instance, AdapterInsertTarget):
             adapter_instance.insert_value(key, value)
 
+    def prepare_insert_many(self, items, owner_instance):
+        adapter_instance = self._create_field_adapter_instance(owner_instance)
+        if not adapter_instance:
+            raise AdapterValidationError('Value cannot be inserted to "%s" attribute because it has missing key in adapted data' % self._name)
+        return adapter_instance.prepare_insert_many(items)
+
     def validate(self, owner_instance):
         AdapterAttribute.validate(self, owner_instance)
         adapter_instance = self._create_field_adapter_instance(owner_instance)
@@ -97,8 +126,8 @@ class AdapterFreeContent(BaseAdapter, AdapterMapped):
             return ret
         return super().__getattr__(item)
 
-    def validate(self, owner_instance=None):
-        super().validate()
+    def _validate_adapter(self):
+        super()._validate_adapter()
         for k, v in self._raw_data.items():
             if k in self.get_adapter_fields():
                 continue
@@ -117,11 +146,25 @@ class AdapterFreeContent(BaseAdapter, AdapterMapped):
                 raise AdapterValidationError('Adapter "%s" is not editable' % self.__class__)
             attribute_instance = self._get_attribute_instance(key, value, self)
             attribute_instance.__set__(self, value)
+            return
 
         if not self._editable:
             raise AdapterValidationError('Adapter "%s" is not editable' % self.__class__)
         super(BaseAdapter, self).__setattr__(key, value)
 
+    def _get_default_insert_target(self, key, value):
+        return self
+
+    def _prepare_free_content_insert(self, items):
+        if not self._editable:
+            raise AdapterValidationError('Adapter "%s" is not editable' % self.__class__)
+        values = collections.OrderedDict()
+        for key, value in items:
+            attribute_instance = self._get_attribute_instance(key, value, self)
+            attribute_instance._validate_set_data(value)
+            values[key] = value
+        return [functools.partial(self._set_raw_values, values)]
+
 
 class AdapterObjectFreeContentAttribute(AdapterObjectAttribute, AdapterMapped):
     def __init__(self, mapping, **kwargs):
@@ -216,6 +259,16 @@ class AdapterFreeTypeAttribute(AdapterAttribute, AdapterMapped, AdapterSearchabl
         if isinstance(attribute_instance, AdapterInsertTarget):
             attribute_instance.insert_value(key, value, owner_instance)
 
+    def prepare_insert_many(self, items, owner_instance):
+        raw_value = self._get_raw_value(owner_instance)
+        if raw_value is None:
+            return []
+
+        attribute_instance = self._get_attribute_instance(self._name, raw_value, owner_instance)
+        if isinstance(attribute_instance, AdapterInsertTarget):
+            return attribute_instance.prepare_insert_many(items, owner_instance)
+        return []
+
     def validate(self, owner_instance):
         AdapterAttribute.validate(self, owner_instance)
         raw_value = self._get_raw_value(owner_instance)
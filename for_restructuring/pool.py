@@ -0,0 +1,31 @@
+class AdapterPool:
+    # keeps one adapter per adapter class and rebinds it to successive records, so streaming jobs do not
+    # allocate an adapter graph per record; adapters are reused, so the pool is not meant to be shared by threads
+    def __init__(self):
+        self._adapters = {}
+
+    def bind(self, adapter_class, raw_data, **kwargs):
+        # an adapter is created with the arguments of the first call, later calls have to pass the same ones
+        pooled = self._adapters.get(adapter_class)
+        if pooled is None:
+            adapter = adapter_class(raw_data, **kwargs)
+            self._adapters[adapter_class] = (adapter, kwargs)
+            return adapter
+        adapter, adapter_kwargs = pooled
+        if kwargs != adapter_kwargs:
+            raise ValueError('Adapter "%s" is pooled with other arguments' % adapter_class.__name__)
+        return adapter.rebind(raw_data)
+
+    def clear(self):
+        self._adapters = {}
+
+
+def iter_adapted(adapter_class, records, **kwargs):
+    # yields the same adapter rebound to every record, it must not be kept past the next iteration
+    adapter = None
+    for raw_data in records:
+        if adapter is None:
+            adapter = adapter_class(raw_data, **kwargs)
+        else:
+            adapter.rebind(raw_data)
+        yield adapter
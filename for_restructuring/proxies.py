@@ -0,0 +1,178 @@
+def materialize(value):
+    if isinstance(value, ProxyDict):
+        return value.materialize()
+    if isinstance(value, list):
+        return [materialize(v) for v in value]
+    return value
+
+
+# encoders write a dict subclass with empty storage as an empty object without asking for its items,
+# so the storage of a proxy always holds this key
+_STORAGE_MARKER = object()
+
+
+class ProxyDict(dict):
+    # dict whose values are loaded from some source on first access and then kept in the dict itself,
+    # subclasses define the source; every dict method goes through the source as well, inherited ones would
+    # see the loaded values only
+    def __init__(self):
+        super().__init__()
+        dict.__setitem__(self, _STORAGE_MARKER, None)
+
+    def _load(self, key):
+        raise KeyError(key)
+
+    def _source_keys(self):
+        return []
+
+    def _source_contains(self, key):
+        return False
+
+    def _discard_source_key(self, key):
+        pass
+
+    def __getitem__(self, key):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        value = self._load(key)
+        dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        found = dict.__contains__(self, key) or self._source_contains(key)
+        dict.pop(self, key, None)
+        self._discard_source_key(key)
+        if not found:
+            raise KeyError(key)
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def popitem(self):
+        keys = self.keys()
+        if not keys:
+            raise KeyError('popitem(): dictionary is empty')
+        key = keys[-1]
+        return key, self.pop(key)
+
+    def clear(self):
+        for key in self.keys():
+            del self[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        merged = self.materialize()
+        merged.update(other)
+        return merged
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or self._source_contains(key)
+
+    def keys(self):
+        keys = list(self._source_keys())
+        if dict.__len__(self) > 1:
+            source_keys = set(keys)
+            keys.extend(k for k in dict.keys(self) if k is not _STORAGE_MARKER and k not in source_keys)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __reversed__(self):
+        return reversed(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def materialize(self):
+        return {k: materialize(v) for k, v in self.items()}
+
+    def copy(self):
+        return self.materialize()
+
+    def __eq__(self, other):
+        return self.materialize() == materialize(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.materialize())
+
+
+class CopyOnWriteDict(ProxyDict):
+    # edits are kept in the overlay (the dict itself), the shared base data is never modified
+    def __init__(self, base):
+        super().__init__()
+        self._base = base
+        self._deleted = set()
+
+    @property
+    def base(self):
+        return self._base
+
+    def _wrap(self, value):
+        if isinstance(value, dict):
+            return CopyOnWriteDict(value)
+        if isinstance(value, list):
+            return [self._wrap(v) for v in value]
+        return value
+
+    def _load(self, key):
+        if key in self._deleted:
+            raise KeyError(key)
+        return self._wrap(self._base[key])
+
+    def _source_keys(self):
+        if not self._deleted:
+            return self._base.keys()
+        return [k for k in self._base.keys() if k not in self._deleted]
+
+    def _source_contains(self, key):
+        return key not in self._deleted and key in self._base
+
+    def _discard_source_key(self, key):
+        if key in self._base:
+            self._deleted.add(key)
+
+    def __setitem__(self, key, value):
+        self._deleted.discard(key)
+        dict.__setitem__(self, key, value)
@@ -0,0 +1,200 @@
+import mmap
+import os
+import struct
+
+from errors import StaleIndexError
+from for_restructuring.lazy import LazyJSONObject, _ARRAY_START, find_value_end, scan_array_items, skip_whitespace
+
+INDEX_SUFFIX = '.idx'
+JSON_ARRAY = 0
+JSON_LINES = 1
+
+_HEADER = struct.Struct('<4sBBBxQQQQ')
+_HEADER_MAGIC = b'JAOI'
+_HEADER_VERSION = 1
+_OFFSET_PAIR = struct.Struct('<QQ')
+
+
+class _IndexHeader:
+    def __init__(self, file_format, complete, source_size, source_mtime_ns, scan_position, record_count):
+        self.file_format = file_format
+        self.complete = complete
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+        self.scan_position = scan_position
+        self.record_count = record_count
+
+    @classmethod
+    def unpack(cls, data):
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, file_format, complete, *fields = _HEADER.unpack_from(data)
+        if magic != _HEADER_MAGIC or version != _HEADER_VERSION:
+            return None
+        return cls(file_format, bool(complete), *fields)
+
+    def pack(self):
+        return _HEADER.pack(_HEADER_MAGIC, _HEADER_VERSION, self.file_format, int(self.complete), self.source_size,
+                            self.source_mtime_ns, self.scan_position, self.record_count)
+
+    def matches(self, source_stat):
+        return self.source_size == source_stat.st_size and self.source_mtime_ns == source_stat.st_mtime_ns
+
+
+def get_index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def detect_file_format(buffer):
+    # JSON Lines records may be arrays as well, so a file starting with an array whose first line is a whole value
+    # followed by more lines is read as JSON Lines; a single line array is ambiguous and taken for a JSON array,
+    # file_format has to be given for a JSON Lines file of one array record
+    end = len(buffer)
+    pos = skip_whitespace(buffer, 0, end)
+    if pos >= end or buffer[pos] != _ARRAY_START:
+        return JSON_LINES
+    line_end = buffer.find(b'\n', pos)
+    if line_end == -1 or skip_whitespace(buffer, line_end, end) == end:
+        return JSON_ARRAY
+    value_end = find_value_end(buffer, pos, line_end)
+    if value_end is not None and skip_whitespace(buffer, value_end, line_end) == line_end:
+        return JSON_LINES
+    return JSON_ARRAY
+
+
+def _scan_json_lines(buffer, pos):
+    end = len(buffer)
+    while pos < end:
+        line_end = buffer.find(b'\n', pos)
+        if line_end == -1:
+            line_end = end
+        start = skip_whitespace(buffer, pos, line_end)
+        if start < line_end:
+            yield start, line_end, line_end + 1
+        pos = line_end + 1
+
+
+def _scan_json_array(buffer, pos):
+    # pos points either at the opening bracket or just behind a comma separating records
+    if pos == 0:
+        pos = skip_whitespace(buffer, 0, len(buffer)) + 1
+    return scan_array_items(buffer, pos, len(buffer))
+
+
+def _read_header(index_path):
+    try:
+        with open(index_path, 'rb') as f:
+            return _IndexHeader.unpack(f.read(_HEADER.size))
+    except FileNotFoundError:
+        return None
+
+
+def build_offset_index(path, index_path=None, file_format=None, checkpoint_every=10000):
+    # scans the source once and writes (start, end) offsets of every record to a sidecar file,
+    # an interrupted build is resumed from its last checkpoint as long as the source did not change
+    index_path = index_path or get_index_path(path)
+    source_stat = os.stat(path)
+    header = _read_header(index_path)
+    if header and header.matches(source_stat) and (file_format is None or header.file_format == file_format):
+        if header.complete:
+            return index_path
+    else:
+        header = None
+
+    with open(path, 'rb') as source, open(index_path, 'r+b' if header else 'w+b') as index_file:
+        if source_stat.st_size == 0:
+            header = _IndexHeader(file_format or JSON_LINES, True, 0, source_stat.st_mtime_ns, 0, 0)
+            index_file.truncate(0)
+            index_file.write(header.pack())
+            return index_path
+
+        buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if header is None:
+                file_format = detect_file_format(buffer) if file_format is None else file_format
+                header = _IndexHeader(file_format, False, source_stat.st_size, source_stat.st_mtime_ns, 0, 0)
+            index_file.truncate(_HEADER.size + header.record_count * _OFFSET_PAIR.size)
+            index_file.seek(0)
+            index_file.write(header.pack())
+            index_file.seek(0, os.SEEK_END)
+
+            scanner = _scan_json_array if header.file_format == JSON_ARRAY else _scan_json_lines
+            pending = []
+            for start, end, next_position in scanner(buffer, header.scan_position):
+                pending.append(_OFFSET_PAIR.pack(start, end))
+                header.scan_position = next_position
+                if len(pending) >= checkpoint_every:
+                    _write_checkpoint(index_file, header, pending)
+            header.complete = True
+            _write_checkpoint(index_file, header, pending)
+        finally:
+            buffer.close()
+    return index_path
+
+
+def _write_checkpoint(index_file, header, pending):
+    index_file.write(b''.join(pending))
+    index_file.flush()
+    header.record_count += len(pending)
+    pending.clear()
+    index_file.seek(0)
+    index_file.write(header.pack())
+    index_file.flush()
+    index_file.seek(0, os.SEEK_END)
+
+
+class IndexedRecordReader:
+    def __init__(self, path, adapter_class, index_path=None, **adapter_kwargs):
+        self._path = path
+        self._index_path = index_path or get_index_path(path)
+        self._adapter_class = adapter_class
+        self._adapter_kwargs = adapter_kwargs
+        self._source = None
+        self._index = None
+
+        header = _read_header(self._index_path)
+        if header is None:
+            raise StaleIndexError('Missing offset index for "%s"' % path)
+        if not header.complete:
+            raise StaleIndexError('Offset index for "%s" is incomplete' % path)
+        if not header.matches(os.stat(path)):
+            raise StaleIndexError('Offset index for "%s" is stale' % path)
+        self._record_count = header.record_count
+        if self._record_count:
+            self._source = self._open_mmap(path)
+            self._index = self._open_mmap(self._index_path)
+
+    @staticmethod
+    def _open_mmap(path):
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self._record_count
+
+    def get_raw_record(self, index):
+        if index < 0:
+            index += self._record_count
+        if not 0 <= index < self._record_count:
+            raise IndexError('Record index out of range')
+        start, end = _OFFSET_PAIR.unpack_from(self._index, _HEADER.size + index * _OFFSET_PAIR.size)
+        return self._source[start:end]
+
+    def __getitem__(self, index):
+        return self._adapter_class(LazyJSONObject(self.get_raw_record(index)), **self._adapter_kwargs)
+
+    def __iter__(self):
+        for index in range(self._record_count):
+            yield self[index]
+
+    def close(self):
+        for m in (self._source, self._index):
+            if m is not None:
+                m.close()
+        self._source = self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
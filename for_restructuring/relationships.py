@@ -0,0 +1,123 @@
+import collections
+import inspect
+
+from for_restructuring.base import BaseAdapter
+
+
+def get_resource_key(resource):
+    return resource['type'], resource['id']
+
+
+def get_raw_resource(resource):
+    # adapted data is read as it is, lazily decoded resources are not decoded further than the members read
+    if isinstance(resource, BaseAdapter):
+        return resource._raw_data
+    return resource
+
+
+def get_relationships(resource):
+    return get_raw_resource(resource).get('relationships', None) or {}
+
+
+def get_relationship_linkage(resource, name):
+    return get_linkage(get_relationships(resource), name)
+
+
+def get_linkage(relationships, name):
+    if not relationships:
+        return None
+    relationship = relationships.get(name, None)
+    if not relationship:
+        return None
+    return relationship.get('data', None)
+
+
+def get_linkage_keys(linkage):
+    if linkage is None:
+        return []
+    if isinstance(linkage, list):
+        return [get_resource_key(item) for item in linkage]
+    return [get_resource_key(linkage)]
+
+
+class InMemoryLoader:
+    # loader over a local list of resource objects, it counts batches so tests can check N+1 patterns
+    def __init__(self, resources):
+        self._resources = {get_resource_key(resource): resource for resource in resources}
+        self.batches = []
+
+    def __call__(self, keys):
+        self.batches.append(list(keys))
+        return {key: self._resources[key] for key in keys if key in self._resources}
+
+
+class RelationshipResolver:
+    # resolves relationship linkages of resource objects with one call of the loader per batch of
+    # deduplicated (type, id) keys; meant to live for a single request, loaded resources are cached in it
+    def __init__(self, loader):
+        self._loader = loader
+        self._cache = {}
+        self._pending = collections.OrderedDict()
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def collect(self, resources, names=None):
+        for resource in resources:
+            relationships = get_relationships(resource)
+            for name in (names if names is not None else relationships.keys()):
+                for key in get_linkage_keys(get_linkage(relationships, name)):
+                    if key not in self._cache:
+                        self._pending[key] = None
+
+    def load(self):
+        keys = list(self._pending)
+        if keys:
+            loaded = self._loader(keys)
+            if inspect.isawaitable(loaded):
+                if inspect.iscoroutine(loaded):
+                    loaded.close()
+                raise TypeError('Loader is asynchronous, resolver has to be used with load_async')
+            self._store(keys, loaded)
+
+    async def load_async(self):
+        keys = list(self._pending)
+        if keys:
+            loaded = self._loader(keys)
+            if inspect.isawaitable(loaded):
+                loaded = await loaded
+            self._store(keys, loaded)
+
+    def resolve(self, resource, name):
+        linkage = get_relationship_linkage(resource, name)
+        self.collect([resource], [name])
+        self.load()
+        return self._get_cached(linkage)
+
+    async def resolve_async(self, resource, name):
+        linkage = get_relationship_linkage(resource, name)
+        self.collect([resource], [name])
+        await self.load_async()
+        return self._get_cached(linkage)
+
+    def resolve_many(self, resources, name):
+        self.collect(resources, [name])
+        return [self.resolve(resource, name) for resource in resources]
+
+    async def resolve_many_async(self, resources, name):
+        self.collect(resources, [name])
+        return [await self.resolve_async(resource, name) for resource in resources]
+
+    def _store(self, keys, loaded):
+        # keys the loader did not return are cached as missing, so they are not requested again
+        for key in keys:
+            self._cache[key] = loaded.get(key, None)
+            self._pending.pop(key, None)
+
+    def _get_cached(self, linkage):
+        if linkage is None:
+            return None
+        if isinstance(linkage, list):
+            return [self._cache[key] for key in get_linkage_keys(linkage)]
+        return self._cache[get_resource_key(linkage)]
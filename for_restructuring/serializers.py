@@ -0,0 +1,97 @@
+import json
+
+from errors import AdapterValidationError
+from for_restructuring.base import BaseAdapter
+from for_restructuring.lazy import LazyJSONObject, skip_whitespace
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+_encoder = json.JSONEncoder(ensure_ascii=True, check_circular=False, allow_nan=False)
+
+
+class StreamingSerializer:
+    def __init__(self, fp, buffer_size=DEFAULT_BUFFER_SIZE):
+        if buffer_size <= 0:
+            raise ValueError('Buffer size must be positive')
+        self._fp = fp
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+
+    def write(self, value):
+        if isinstance(value, (list, tuple)):
+            self._write_bytes(b'[')
+            for index, item in enumerate(value):
+                if index:
+                    self._write_bytes(b',')
+                self._write_value(self._get_raw_data(item))
+            self._write_bytes(b']')
+        else:
+            self._write_value(self._get_raw_data(value))
+
+    def write_bytes(self, data):
+        # already encoded JSON fragments, e.g. the members of a document written piece by piece
+        self._write_bytes(data)
+
+    def flush(self):
+        if self._buffer:
+            self._fp.write(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _get_raw_data(self, value):
+        # adapted data is written as it is, so unmodified values of lazy objects are copied from their buffer
+        if isinstance(value, BaseAdapter):
+            return value._raw_data
+        return value
+
+    def _write_bytes(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def _write_raw(self, buffer, start, end):
+        # unmodified values of byte-backed data are copied as they are, without decoding
+        start = skip_whitespace(buffer, start, end)
+        if end - start >= self._buffer_size:
+            self.flush()
+            self._fp.write(buffer[start:end])
+        else:
+            self._write_bytes(buffer[start:end])
+
+    def _write_value(self, value):
+        if isinstance(value, dict):
+            self._write_object(value)
+        elif isinstance(value, (list, tuple)):
+            self._write_bytes(b'[')
+            for index, item in enumerate(value):
+                if index:
+                    self._write_bytes(b',')
+                self._write_value(item)
+            self._write_bytes(b']')
+        else:
+            try:
+                self._write_bytes(_encoder.encode(value).encode('ascii'))
+            except (TypeError, ValueError) as e:
+                raise AdapterValidationError('Value cannot be serialized: %s' % e)
+
+    def _write_object(self, value):
+        self._write_bytes(b'{')
+        is_lazy = isinstance(value, LazyJSONObject)
+        for index, key in enumerate(value.keys()):
+            if index:
+                self._write_bytes(b',')
+            if not isinstance(key, str):
+                raise AdapterValidationError('Incorrect key type "%s"' % key)
+            self._write_bytes(_encoder.encode(key).encode('ascii'))
+            self._write_bytes(b':')
+            span = value.raw_span(key) if is_lazy else None
+            if span:
+                self._write_raw(value.buffer, *span)
+            else:
+                self._write_value(value[key])
+        self._write_bytes(b'}')
+
+
+def serialize_to_stream(value, fp, buffer_size=DEFAULT_BUFFER_SIZE):
+    serializer = StreamingSerializer(fp, buffer_size)
+    serializer.write(value)
+    serializer.flush()
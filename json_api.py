@@ -21,13 +21,13 @@ class RelationshipItemData(schema.SchemaCompoundedAttribute):
 
 relationships_data_type_mapping = {
     dict: RelationshipItemData(),
-    list: schema.SchemaCollectionAttribute(inner_attribute=RelationshipItemData())
+    list: schema.SchemaCollectionAttribute(inner_attribute=RelationshipItemData(), required=False)
 }
 
 
 class RelationshipItem(schema.SchemaCompoundedAttribute):
     links = RelationshipLinksObject(required=False)
-    data = schema.SchemaFreeTypeAttribute(mapping=relationships_data_type_mapping)
+    data = schema.SchemaFreeTypeAttribute(mapping=relationships_data_type_mapping, nullable=True)
 
 
 relationships_type_mapping = {
@@ -45,13 +45,43 @@ class MainDataItem(schema.SchemaCompoundedAttribute):
 
 main_data_type_mapping = {
     dict: MainDataItem(),
-    list: schema.SchemaCollectionAttribute(inner_attribute=MainDataItem())
+    list: schema.SchemaCollectionAttribute(inner_attribute=MainDataItem(), required=False)
 }
 
 
 class JSONApiSchema(schema.Schema):
-    data = schema.SchemaFreeTypeAttribute(mapping=main_data_type_mapping)
-    #included
+    # a document holds null for a missing single resource and an empty list for an empty collection
+    data = schema.SchemaFreeTypeAttribute(mapping=main_data_type_mapping, nullable=True)
+    included = schema.SchemaCollectionAttribute(inner_attribute=MainDataItem(), required=False)
+
+
+def create_typed_schema_class(resource_items, default=None, name='TypedJSONApiSchema'):
+    # resource_items maps JSON:API "type" member values to MainDataItem subclasses,
+    # every resource is then validated only against the schema of its own type
+    resource_item = schema.SchemaDiscriminatedAttribute(discriminator='type', mapping=resource_items, default=default)
+    data_type_mapping = {
+        dict: resource_item,
+        list: schema.SchemaCollectionAttribute(inner_attribute=resource_item, required=False)
+    }
+    return type(name, (schema.Schema,), {'data': schema.SchemaFreeTypeAttribute(mapping=data_type_mapping,
+                                                                                   nullable=True)})
+
+
+def get_sparse_fieldset_selectors(fields):
+    # converts parsed fields[TYPE]=a,b query parameters into validator path selectors,
+    # data items are not dispatched by type so the fields of all types are selected for every item
+    members = set()
+    for type_fields in fields.values():
+        if isinstance(type_fields, str):
+            type_fields = type_fields.split(',')
+        members.update(f.strip() for f in type_fields if f.strip())
+
+    item_selectors = ['type', 'id']
+    for member in sorted(members):
+        item_selectors.append('attributes/%s' % member)
+        item_selectors.append('relationships/%s' % member)
+    # a single resource object and a collection of them
+    return ['data/%s' % s for s in item_selectors] + ['data/*/%s' % s for s in item_selectors]
 
 
 raw_data = {
@@ -0,0 +1,174 @@
+import bisect
+import threading
+
+from errors import FreeContentKey
+
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+DOCUMENTS_VALIDATED = 'jsonadapter_documents_validated_total'
+VALIDATION_FAILURES = 'jsonadapter_validation_failures_total'
+VALIDATION_SECONDS = 'jsonadapter_validation_seconds'
+ADAPTERS_VALIDATED = 'jsonadapter_adapters_validated_total'
+ADAPTER_VALIDATION_FAILURES = 'jsonadapter_adapter_validation_failures_total'
+ADAPTER_VALIDATION_SECONDS = 'jsonadapter_adapter_validation_seconds'
+ADAPTER_READS = 'jsonadapter_adapter_reads_total'
+ADAPTER_WRITES = 'jsonadapter_adapter_writes_total'
+ADAPTER_SEARCHES = 'jsonadapter_adapter_searches_total'
+
+# global registry used by validators and adapters, recording is skipped entirely while it is None
+registry = None
+
+
+class _ThreadMetrics:
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+class MetricsRegistry:
+    # every thread records into its own dicts, so the hot path takes no lock; they are merged on export
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread_metrics = []
+
+    @property
+    def buckets(self):
+        return self._buckets
+
+    def _get_thread_metrics(self):
+        try:
+            return self._local.metrics
+        except AttributeError:
+            thread_metrics = _ThreadMetrics()
+            with self._lock:
+                self._thread_metrics.append(thread_metrics)
+            self._local.metrics = thread_metrics
+            return thread_metrics
+
+    def increment(self, name, labels=(), value=1):
+        counters = self._get_thread_metrics().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        histograms = self._get_thread_metrics().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # one slot per bucket, one for +Inf and the sum of observed values
+            histogram = histograms[key] = [0] * (len(self._buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self._buckets, value)] += 1
+        histogram[-1] += value
+
+    def reset(self):
+        with self._lock:
+            for thread_metrics in self._thread_metrics:
+                thread_metrics.counters.clear()
+                thread_metrics.histograms.clear()
+
+    def _merge(self):
+        counters = {}
+        histograms = {}
+        with self._lock:
+            thread_metrics_list = list(self._thread_metrics)
+        for thread_metrics in thread_metrics_list:
+            for key, value in thread_metrics.counters.copy().items():
+                counters[key] = counters.get(key, 0) + value
+            for key, histogram in thread_metrics.histograms.copy().items():
+                merged = histograms.setdefault(key, [0] * len(histogram))
+                for index, value in enumerate(list(histogram)):
+                    merged[index] += value
+        return counters, histograms
+
+    def snapshot(self):
+        counters, histograms = self._merge()
+        snapshot = {'counters': {}, 'histograms': {}}
+        for (name, labels), value in sorted(counters.items()):
+            snapshot['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), histogram in sorted(histograms.items()):
+            cumulative = self._get_cumulative_buckets(histogram)
+            snapshot['histograms'].setdefault(name, []).append({
+                'labels': dict(labels),
+                'buckets': dict(zip(self._buckets + (float('inf'),), cumulative)),
+                'count': cumulative[-1],
+                'sum': histogram[-1]
+            })
+        return snapshot
+
+    def to_prometheus_text(self):
+        counters, histograms = self._merge()
+        lines = []
+        last_name = None
+        for (name, labels), value in sorted(counters.items()):
+            if name != last_name:
+                lines.append('# TYPE %s counter' % name)
+                last_name = name
+            lines.append('%s%s %s' % (name, _format_labels(labels), value))
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name != last_name:
+                lines.append('# TYPE %s histogram' % name)
+                last_name = name
+            cumulative = self._get_cumulative_buckets(histogram)
+            for bucket, value in zip(self._buckets + ('+Inf',), cumulative):
+                lines.append('%s_bucket%s %s' % (name, _format_labels(labels + (('le', str(bucket)),)), value))
+            lines.append('%s_sum%s %r' % (name, _format_labels(labels), histogram[-1]))
+            lines.append('%s_count%s %s' % (name, _format_labels(labels), cumulative[-1]))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    @staticmethod
+    def _get_cumulative_buckets(histogram):
+        cumulative = []
+        total = 0
+        for value in histogram[:-1]:
+            total += value
+            cumulative.append(total)
+        return cumulative
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, _escape_label_value(v)) for k, v in labels)
+
+
+def enable(metrics_registry=None):
+    global registry
+    registry = metrics_registry if metrics_registry is not None else MetricsRegistry()
+    return registry
+
+
+def disable():
+    global registry
+    registry = None
+
+
+def get_error_path_label(error):
+    # indexes and free content keys are collapsed, so the label has one value per failing schema attribute
+    path = getattr(error, 'path', None)
+    if not path:
+        return ''
+    return '/'.join('[*]' if isinstance(segment, int) else '*' if isinstance(segment, FreeContentKey) else segment
+                    for segment in path)
+
+
+def record_validation(metrics_registry, seconds, labels, error=None, adapter=False):
+    if adapter:
+        validated, failures, latency = ADAPTERS_VALIDATED, ADAPTER_VALIDATION_FAILURES, ADAPTER_VALIDATION_SECONDS
+    else:
+        validated, failures, latency = DOCUMENTS_VALIDATED, VALIDATION_FAILURES, VALIDATION_SECONDS
+    metrics_registry.increment(validated, labels)
+    metrics_registry.observe(latency, seconds, labels)
+    if error is not None:
+        metrics_registry.increment(failures, labels + (('path', get_error_path_label(error)),))
+
+
+def record_adapter_operation(metrics_registry, name, adapter_instance, value=1):
+    metrics_registry.increment(name, (('adapter', adapter_instance.__class__.__name__),), value)
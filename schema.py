@@ -1,7 +1,12 @@
 import collections
+import weakref
 
 import validators
 
+KeyPrefix = validators.KeyPrefix
+
+_attributes_validators_cache = weakref.WeakKeyDictionary()
+
 
 class SchemaAttribute:
     def __init__(self, data_type, required=True, required_with=None):
@@ -19,7 +24,8 @@ class SchemaAttribute:
         self._name = name
 
     def get_validator(self):
-        return validators.AttributeValidator(
+        return validators.get_shared_validator(
+            validators.AttributeValidator,
             name=self._name,
             data_type=self._data_type,
             required=self._required,
@@ -51,10 +57,14 @@ class SchemaCompoundedMixin(object, metaclass=SchemasMetaClass):
         return self.__class__.__ordered_attributes__
 
     def get_attributes_validators(self):
-        validators = []
-        for attr_name, attribute in self.get_schema_attributes().items():
-            validators.append(attribute.get_validator())
-        return validators
+        # attributes belong to the class, so their validators are built once per schema class
+        attributes_validators = _attributes_validators_cache.get(self.__class__)
+        if attributes_validators is None:
+            attributes_validators = []
+            for attr_name, attribute in self.get_schema_attributes().items():
+                attributes_validators.append(attribute.get_validator())
+            _attributes_validators_cache[self.__class__] = attributes_validators
+        return list(attributes_validators)
 
 
 class SchemaCompoundedAttribute(SchemaCompoundedMixin, SchemaAttribute):
@@ -63,7 +73,8 @@ class SchemaCompoundedAttribute(SchemaCompoundedMixin, SchemaAttribute):
         super().__init__(data_type=dict, **kwargs)
 
     def get_validator(self):
-        return validators.CompoundedAttributeValidator(
+        return validators.get_shared_validator(
+            validators.CompoundedAttributeValidator,
             child_validators=self.get_attributes_validators(),
             name=self._name,
             required=self._required,
@@ -78,13 +89,19 @@ class MappingMixin(object):
 
 
 class SchemaFreeContentCompoundedAttribute(MappingMixin, SchemaCompoundedAttribute):
+    def __init__(self, mapping, key_patterns=None, **kwargs):
+        super().__init__(mapping=mapping, **kwargs)
+        self._key_patterns = key_patterns.items() if isinstance(key_patterns, dict) else (key_patterns or [])
+
     def get_validator(self):
         validator_mapping = {}
         for k, v in self._mapping.items():
             validator_mapping[k] = v.get_validator()
 
-        return validators.FreeContentCompoundedAttributeValidator(
+        return validators.get_shared_validator(
+            validators.FreeContentCompoundedAttributeValidator,
             mapping=validator_mapping,
+            key_patterns=[(pattern, attribute.get_validator()) for pattern, attribute in self._key_patterns],
             child_validators=self.get_attributes_validators(),
             name=self._name,
             required=self._required,
@@ -93,17 +110,45 @@ class SchemaFreeContentCompoundedAttribute(MappingMixin, SchemaCompoundedAttribu
 
 
 class SchemaFreeTypeAttribute(MappingMixin, SchemaAttribute):
-    def __init__(self, **kwargs):
+    # nullable lets a present key hold null or an empty value, which is then left to the mapping
+    def __init__(self, nullable=False, **kwargs):
         kwargs.pop('data_type', None)
         super().__init__(data_type=object, **kwargs)
+        self._nullable = nullable
+
+    def get_validator(self):
+        validator_mapping = {}
+        for k, v in self._mapping.items():
+            validator_mapping[k] = v.get_validator()
+
+        return validators.get_shared_validator(
+            validators.FreeTypeAttributeValidator,
+            mapping=validator_mapping,
+            name=self._name,
+            required=self._required,
+            required_with=self._required_with,
+            nullable=self._nullable
+        )
+
+
+class SchemaDiscriminatedAttribute(SchemaAttribute):
+    def __init__(self, discriminator, mapping, default=None, **kwargs):
+        kwargs.pop('data_type', None)
+        super().__init__(data_type=dict, **kwargs)
+        self._discriminator = discriminator
+        self._mapping = mapping
+        self._default = default
 
     def get_validator(self):
         validator_mapping = {}
         for k, v in self._mapping.items():
             validator_mapping[k] = v.get_validator()
 
-        return validators.FreeTypeAttributeValidator(
+        return validators.get_shared_validator(
+            validators.DiscriminatedAttributeValidator,
+            discriminator=self._discriminator,
             mapping=validator_mapping,
+            default=self._default.get_validator() if self._default is not None else None,
             name=self._name,
             required=self._required,
             required_with=self._required_with
@@ -117,7 +162,8 @@ class SchemaCollectionAttribute(SchemaAttribute):
         self._inner_attribute = inner_attribute
 
     def get_validator(self):
-        return validators.CollectionAttributeValidator(
+        return validators.get_shared_validator(
+            validators.CollectionAttributeValidator,
             inner_validator=self._inner_attribute.get_validator(),
             name=self._name,
             required=self._required,
@@ -127,4 +173,8 @@ class SchemaCollectionAttribute(SchemaAttribute):
 
 class Schema(SchemaCompoundedMixin):
     def get_validator(self):
-        return validators.SchemaValidator(self.get_attributes_validators())
\ No newline at end of file
+        return validators.get_shared_validator(
+            validators.SchemaValidator,
+            child_validators=self.get_attributes_validators(),
+            schema_name=self.__class__.__name__
+        )
\ No newline at end of file
@@ -0,0 +1,205 @@
+import concurrent.futures
+import json
+import mmap
+import os
+import sys
+from multiprocessing import shared_memory
+
+import validators
+from errors import AdapterValidationError, ShardedValidationError, get_error_path
+from for_restructuring.lazy import LazyJSONObject, ObjectScanner, scan_array_items, skip_whitespace, \
+    split_array_items
+
+SHARED_MEMORY_SOURCE = 'shm'
+FILE_SOURCE = 'file'
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# validators built by a worker process, keyed by schema class and collection name
+_worker_item_validators = {}
+
+
+def get_collection_item_validator(schema_validator, collection_name):
+    for child_validator in schema_validator._child_validators:
+        if child_validator.name != collection_name:
+            continue
+        if isinstance(child_validator, validators.FreeTypeAttributeValidator):
+            child_validator = child_validator._mapping.get(list)
+        if isinstance(child_validator, validators.CollectionAttributeValidator):
+            return child_validator, child_validator._inner_validator
+    raise AdapterValidationError('Schema has no collection attribute "%s"' % collection_name)
+
+
+def _attach_shared_memory(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # workers share the resource tracker of the parent whatever the start method is, so attaching registers
+    # the segment once more for nothing, while unregistering it would drop the registration of the parent
+    return shared_memory.SharedMemory(name=name)
+
+
+def _open_source(source):
+    kind, name = source
+    if kind == SHARED_MEMORY_SOURCE:
+        memory = _attach_shared_memory(name)
+        return memory, memory.buf
+    with open(name, 'rb') as f:
+        memory = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memory, memory
+
+
+def _get_worker_item_validator(schema_class, collection_name):
+    key = (schema_class, collection_name)
+    if key not in _worker_item_validators:
+        schema_validator = schema_class().get_validator()
+        _worker_item_validators[key] = get_collection_item_validator(schema_validator, collection_name)[1]
+    return _worker_item_validators[key]
+
+
+def _validate_item(item_validator, collection_name, buffer, index, start, end):
+    item_name = '[%s]' % index
+    try:
+        item = json.loads(bytes(buffer[start:end]))
+        item_validator.validate({item_name: item}, [collection_name], item_name)
+    except (AdapterValidationError, ValueError) as e:
+        return index, get_error_path(e), str(e)
+    return None
+
+
+def _validate_item_range(item_validator, collection_name, buffer, start, stop, end):
+    # items from the one at start up to the one at stop, which is left to the next range; failing items are
+    # returned with their index within the range, the parent knows the offset only when all ranges are counted
+    count = 0
+    failing_items = []
+    for item_start, item_end, next_position in scan_array_items(buffer, start, end):
+        if _validate_item(item_validator, collection_name, buffer, count, item_start, item_end) is not None:
+            failing_items.append((count, item_start, item_end))
+        count += 1
+        if stop is not None and next_position >= stop:
+            break
+    return count, failing_items
+
+
+def _validate_items(schema_class, collection_name, source, start, stop, end):
+    item_validator = _get_worker_item_validator(schema_class, collection_name)
+    memory, buffer = _open_source(source)
+    try:
+        return _validate_item_range(item_validator, collection_name, buffer, start, stop, end)
+    finally:
+        del buffer
+        memory.close()
+
+
+class ShardedCollectionValidator:
+    # validates a document whose collection member holds a huge array, items are validated
+    # by worker processes reading the raw document from shared memory or a memory-mapped file;
+    # the array is cut in ranges of about chunk_size bytes, workers find the items of their range
+    def __init__(self, schema_class, collection_name='data', workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self._schema_class = schema_class
+        self._schema_validator = schema_class().get_validator()
+        self._collection_name = collection_name
+        self._collection_validator, self._item_validator = get_collection_item_validator(self._schema_validator,
+                                                                                          collection_name)
+        self._workers = workers or os.cpu_count() or 1
+        self._chunk_size = chunk_size
+
+    def validate(self, buffer):
+        failures = self.find_failures(buffer)
+        if failures:
+            raise ShardedValidationError(failures)
+
+    def validate_file(self, path):
+        failures = self.find_failures_in_file(path)
+        if failures:
+            raise ShardedValidationError(failures)
+
+    def find_failures(self, buffer):
+        buffer = memoryview(buffer)
+        memory = shared_memory.SharedMemory(create=True, size=max(len(buffer), 1))
+        try:
+            memory.buf[:len(buffer)] = buffer
+            return self._find_failures(buffer, (SHARED_MEMORY_SOURCE, memory.name))
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def find_failures_in_file(self, path):
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return self._find_failures(buffer, (FILE_SOURCE, path))
+        finally:
+            buffer.close()
+
+    def _find_failures(self, buffer, source):
+        # failures are (item index or None, error path, message) in the order a serial validation would meet them;
+        # the root members are scanned once here, the collection array is only cut in ranges on the way
+        start = skip_whitespace(buffer, 0, len(buffer))
+        if start >= len(buffer) or buffer[start] != ord('{'):
+            return [(None, '', 'Incorrect root data type')]
+        scanner = ObjectScanner(buffer, start, len(buffer))
+        index = {}
+        positions = None
+        member = scanner.next_member()
+        while member is not None:
+            key, value_start = member
+            value_end = None
+            if key == self._collection_name:
+                positions = None
+            if key == self._collection_name and buffer[value_start] == ord('['):
+                positions, value_end = split_array_items(buffer, value_start + 1, len(buffer), self._chunk_size)
+            index[key] = (value_start, scanner.skip_value(value_end))
+            member = scanner.next_member()
+        root = LazyJSONObject(buffer, start, scanner.object_end, index=index)
+        span = index.get(self._collection_name)
+        if not positions:
+            # nothing to shard, an empty or not an array collection is validated as usual
+            return self._validate_serially(root)
+
+        failures = []
+        for child_validator in self._schema_validator._child_validators:
+            try:
+                if child_validator.name == self._collection_name:
+                    self._validate_collection_without_items(child_validator, root)
+                else:
+                    child_validator.validate(root)
+            except AdapterValidationError as e:
+                failures.append((None, get_error_path(e), str(e)))
+                continue
+            if child_validator.name == self._collection_name:
+                failures.extend(self._validate_items(buffer, source, positions, span[1]))
+        return failures
+
+    def _validate_serially(self, root):
+        try:
+            self._schema_validator.validate(root)
+        except AdapterValidationError as e:
+            return [(None, get_error_path(e), str(e))]
+        return []
+
+    def _validate_collection_without_items(self, child_validator, root):
+        # only the own constraints of the collection, which is known not to be empty, items are left to the workers
+        parent_data = dict.fromkeys(root.keys())
+        parent_data[self._collection_name] = [None]
+        validators.AttributeValidator.validate(child_validator, parent_data)
+        validators.AttributeValidator.validate(self._collection_validator, parent_data, None, self._collection_name)
+
+    def _validate_items(self, buffer, source, positions, end):
+        ranges = list(zip(positions, positions[1:] + [None]))
+        if self._workers == 1 or len(ranges) == 1:
+            results = [_validate_item_range(self._item_validator, self._collection_name, buffer, start, stop, end)
+                       for start, stop in ranges]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(self._workers, len(ranges))) as executor:
+                futures = [executor.submit(_validate_items, self._schema_class, self._collection_name, source,
+                                           start, stop, end) for start, stop in ranges]
+                results = [future.result() for future in futures]
+
+        # failing items are validated again here, under the index they have in the whole collection
+        failures = []
+        first_index = 0
+        for count, failing_items in results:
+            for index, item_start, item_end in failing_items:
+                failures.append(_validate_item(self._item_validator, self._collection_name, buffer,
+                                               first_index + index, item_start, item_end))
+            first_index += count
+        return failures
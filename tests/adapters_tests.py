@@ -0,0 +1,685 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import unittest
+from copy import deepcopy
+from unittest import mock
+
+import tests.utils
+import errors
+import json_api
+from for_restructuring import documents, lazy, pool, proxies, records, relationships, serializers
+from for_restructuring.base import AdapterAttribute, AdapterInsertTarget, BaseAdapter
+from for_restructuring.lazy import LazyJSONObject
+
+
+class TestLazyBufferAdapter(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.user_data['posts'] = [{'title': 'Braces } and "quotes" {', 'tags': ['[', ']']}]
+        self.buffer = json.dumps(self.user_data, indent=2).encode()
+        self.adapter = tests.utils.UserAdapter.from_buffer(self.buffer)
+
+    def test_adapter_reads_fields_from_buffer(self):
+        self.assertEqual(self.adapter.username, 'faderskd')
+        self.assertEqual(self.adapter.profile.settings.profile_color, 'green')
+        self.assertEqual(self.adapter.job, 'Programmer')
+
+    def test_adapter_decodes_only_accessed_subtrees(self):
+        self.assertEqual(self.adapter.username, 'faderskd')
+        raw_data = self.adapter._raw_data
+        self.assertEqual([key for key in dict.keys(raw_data) if isinstance(key, str)], ['username'])
+        self.assertIsNotNone(raw_data.raw_span('posts'))
+
+    def test_nested_objects_are_lazy(self):
+        profile = self.adapter._raw_data['profile']
+        self.assertIsInstance(profile, LazyJSONObject)
+
+    def test_adapter_validates_and_edits_buffer_data(self):
+        self.adapter.validate()
+        self.adapter.username = 'daniel'
+        self.adapter.hobby = 'cycling'
+        self.user_data['username'] = 'daniel'
+        self.user_data['attributes']['hobby'] = 'cycling'
+        self.assertEqual(self.adapter.serialize_to_raw_data(), self.user_data)
+
+    def test_serialized_raw_data_is_encoded_whole(self):
+        self.assertIs(self.adapter.serialize_to_raw_data(), self.adapter._raw_data)
+        self.assertEqual(json.loads(json.dumps(self.adapter.serialize_to_raw_data())), self.user_data)
+        self.assertEqual(self.adapter.username, 'faderskd')
+        self.assertEqual(json.loads(json.dumps(self.adapter.serialize_to_raw_data())), self.user_data)
+        self.assertEqual(json.loads(json.dumps(self.adapter.serialize_to_raw_data(), indent=1)), self.user_data)
+
+    def test_memoryview_buffer(self):
+        adapter = tests.utils.UserAdapter.from_buffer(memoryview(self.buffer))
+        self.assertEqual(adapter.email, 'daniel@op.pl')
+
+    def test_non_object_buffer_raises_error(self):
+        with self.assertRaises(errors.AdapterValidationError):
+            tests.utils.UserAdapter.from_buffer(b'[1, 2]')
+
+    def test_escaped_strings_and_deep_nesting(self):
+        deep_value = 'end'
+        for _ in range(20):
+            deep_value = [{'nested': deep_value, 'text': '} \\" ]'}]
+        data = {'a\\"b': 'x \\\\" } [', 'deep': deep_value, 'tail': [1, {}, [], 'z']}
+        lazy = LazyJSONObject(json.dumps(data).encode())
+        self.assertEqual(list(lazy.keys()), ['a\\"b', 'deep', 'tail'])
+        self.assertEqual(lazy['tail'], data['tail'])
+        self.assertEqual(lazy.materialize(), data)
+
+    def test_array_items_scanned_across_windows(self):
+        items = [{'text': 'item ] %s' % i, 'values': list(range(i))} for i in range(30)]
+        buffer = json.dumps(items).encode()
+        spans = list(lazy.scan_array_items(buffer, 1, len(buffer), window_size=16))
+        self.assertEqual([json.loads(buffer[start:end]) for start, end, _ in spans], items)
+
+    def test_object_members_scanned_across_windows(self):
+        data = {'a\\"b': 'x \\\\" } [', 'number': 12345678, 'list': [1, {'x': '}'}], 'empty': {}}
+        buffer = json.dumps(data).encode()
+        scanner = lazy.ObjectScanner(buffer, 0, len(buffer), window_size=4)
+        members = {}
+        member = scanner.next_member()
+        while member is not None:
+            key, value_start = member
+            members[key] = json.loads(buffer[value_start:scanner.skip_value()])
+            member = scanner.next_member()
+        self.assertEqual(members, data)
+        self.assertEqual(scanner.object_end, len(buffer))
+
+    def test_array_items_scanned_up_to_the_one_read(self):
+        data = {'data': [{'id': i, 'text': '] %s' % i} for i in range(5)] + [7, 'last'], 'tail': 'x'}
+        document = LazyJSONObject(json.dumps(data).encode())
+        items = document['data']
+        self.assertIsInstance(items, lazy.LazyJSONArray)
+        self.assertEqual(items[1]['id'], 1)
+        self.assertEqual(list.__len__(items), 2)
+        self.assertEqual(items[-1], 'last')
+        self.assertEqual(items, data['data'])
+        self.assertEqual(document['tail'], 'x')
+        self.assertEqual(list(document.keys()), ['data', 'tail'])
+
+    def test_array_split_in_ranges_at_item_boundaries(self):
+        items = [{'text': 'item ], {"a": [%s]} \\ \\"' % i, 'values': [{'n': n} for n in range(i % 4)]}
+                 for i in range(40)] + [7, 'last', 123456789]
+        buffer = json.dumps({'data': items, 'tail': [1]}, indent=1).encode()
+        array_start = buffer.index(b'[')
+        array_end = buffer.index(b'"tail"') - 3
+        boundaries = {array_start + 1} | {next_position for _, _, next_position in
+                                          lazy.scan_array_items(buffer, array_start + 1, len(buffer))}
+        for size in (1, 7, 50, 300, len(buffer)):
+            positions, end = lazy.split_array_items(buffer, array_start + 1, len(buffer), size)
+            self.assertEqual(positions[0], array_start + 1)
+            self.assertLessEqual(set(positions), boundaries)
+            self.assertEqual(positions, sorted(set(positions)))
+            self.assertEqual(end, array_end)
+        self.assertEqual(len(lazy.split_array_items(buffer, array_start + 1, len(buffer), 1)[0]), len(items))
+        self.assertEqual(lazy.split_array_items(b'[ ]', 1, 3, 1), ([], 3))
+
+
+class TestIndexedRecordReader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = []
+        for i in range(5):
+            record = deepcopy(tests.utils.example_adapter_user_data)
+            record['username'] = 'user%s' % i
+            self.records.append(record)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_reader_returns_records_from_json_array(self):
+        path = self._write('users.json', json.dumps(self.records, indent=2))
+        records.build_offset_index(path)
+        with records.IndexedRecordReader(path, tests.utils.UserAdapter) as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertEqual(reader[3].username, 'user3')
+            self.assertEqual(reader[-1].profile.last_logged, 'yesterday')
+
+    def test_reader_returns_records_from_json_lines(self):
+        path = self._write('users.jsonl', '\n'.join(json.dumps(r) for r in self.records) + '\n\n')
+        records.build_offset_index(path)
+        with records.IndexedRecordReader(path, tests.utils.UserAdapter) as reader:
+            self.assertEqual([r.username for r in reader], ['user%s' % i for i in range(5)])
+
+    def test_json_lines_of_array_records_are_detected(self):
+        self.assertEqual(records.detect_file_format(b'[1, [2]]\n[3, 4]\n'), records.JSON_LINES)
+        self.assertEqual(records.detect_file_format(b'[[1, 2],\n [3, 4]]\n'), records.JSON_ARRAY)
+        self.assertEqual(records.detect_file_format(b'[\n  {"a": 1}\n]'), records.JSON_ARRAY)
+        self.assertEqual(records.detect_file_format(b'[{"a": 1}, {"a": 2}]\n'), records.JSON_ARRAY)
+        path = self._write('arrays.jsonl', '[1, 2]\n["]", 3]\n')
+        records.build_offset_index(path)
+        with records.IndexedRecordReader(path, tests.utils.UserAdapter) as reader:
+            self.assertEqual([json.loads(reader.get_raw_record(i)) for i in range(len(reader))], [[1, 2], [']', 3]])
+
+    def test_reader_detects_stale_index(self):
+        path = self._write('users.json', json.dumps(self.records))
+        records.build_offset_index(path)
+        self._write('users.json', json.dumps(self.records[:2]))
+        with self.assertRaises(errors.StaleIndexError):
+            records.IndexedRecordReader(path, tests.utils.UserAdapter)
+
+    def test_interrupted_index_build_is_resumed(self):
+        path = self._write('users.json', json.dumps(self.records))
+        write_checkpoint = records._write_checkpoint
+        calls = []
+
+        def interrupted_checkpoint(*args):
+            calls.append(args)
+            write_checkpoint(*args)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+
+        with mock.patch.object(records, '_write_checkpoint', interrupted_checkpoint):
+            with self.assertRaises(KeyboardInterrupt):
+                records.build_offset_index(path, checkpoint_every=1)
+        with self.assertRaises(errors.StaleIndexError):
+            records.IndexedRecordReader(path, tests.utils.UserAdapter)
+
+        records.build_offset_index(path, checkpoint_every=1)
+        with records.IndexedRecordReader(path, tests.utils.UserAdapter) as reader:
+            self.assertEqual([r.username for r in reader], ['user%s' % i for i in range(5)])
+
+
+class TestStreamingSerializer(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.user_data['description'] = 'Zażółć "gęślą" jaźń'
+
+    def test_serializer_writes_adapter(self):
+        stream = io.BytesIO()
+        serializers.serialize_to_stream(tests.utils.UserAdapter(deepcopy(self.user_data)), stream, buffer_size=8)
+        self.assertEqual(json.loads(stream.getvalue()), self.user_data)
+
+    def test_serializer_writes_list_of_adapters(self):
+        adapters = [tests.utils.UserAdapter(deepcopy(self.user_data)) for _ in range(3)]
+        adapters[1].username = 'daniel'
+        stream = io.BytesIO()
+        serializers.serialize_to_stream(adapters, stream)
+        written = json.loads(stream.getvalue())
+        self.assertEqual(len(written), 3)
+        self.assertEqual(written[1]['username'], 'daniel')
+
+    def test_serializer_copies_unmodified_buffer_fields(self):
+        adapter = tests.utils.UserAdapter.from_buffer(json.dumps(self.user_data).encode())
+        adapter.username = 'daniel'
+        adapter.profile.last_logged = 'today'
+        stream = io.BytesIO()
+        serializers.serialize_to_stream(adapter, stream, buffer_size=16)
+        self.user_data['username'] = 'daniel'
+        self.user_data['profile']['last_logged'] = 'today'
+        self.assertEqual(json.loads(stream.getvalue()), self.user_data)
+        self.assertIsNotNone(adapter._raw_data.raw_span('attributes'))
+
+    def test_serializer_flushes_in_chunks(self):
+        stream = mock.Mock()
+        serializers.serialize_to_stream(tests.utils.UserAdapter(deepcopy(self.user_data)), stream, buffer_size=32)
+        self.assertGreater(stream.write.call_count, 1)
+
+
+class TestCopyOnWriteAdapter(unittest.TestCase):
+    def setUp(self):
+        self.shared_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.original_data = deepcopy(self.shared_data)
+        self.adapter = tests.utils.UserAdapter.copy_on_write(self.shared_data)
+
+    def test_edits_do_not_modify_shared_data(self):
+        self.adapter.username = 'daniel'
+        self.adapter.profile.settings.profile_color = 'red'
+        self.adapter.hobby = 'cycling'
+        self.assertEqual(self.shared_data, self.original_data)
+
+    def test_reads_see_edits_and_shared_data(self):
+        self.adapter.username = 'daniel'
+        self.adapter.profile.last_logged = 'today'
+        self.assertEqual(self.adapter.username, 'daniel')
+        self.assertEqual(self.adapter.profile.last_logged, 'today')
+        self.assertEqual(self.adapter.profile.settings.profile_color, 'green')
+        self.assertEqual(self.adapter.job, 'Programmer')
+
+    def test_materialize_merges_edits(self):
+        self.adapter.profile.settings.stay_logged = False
+        self.adapter.hobby = 'cycling'
+        del self.adapter._raw_data['birth_date']
+        merged = self.adapter.serialize_to_raw_data().materialize()
+        self.original_data['profile']['settings']['stay_logged'] = False
+        self.original_data['attributes']['hobby'] = 'cycling'
+        del self.original_data['birth_date']
+        self.assertEqual(merged, self.original_data)
+        self.assertIs(type(merged['profile']), dict)
+
+    def test_serialized_raw_data_is_encoded_whole(self):
+        self.adapter.username = 'daniel'
+        self.original_data['username'] = 'daniel'
+        self.assertEqual(json.loads(json.dumps(self.adapter.serialize_to_raw_data())), self.original_data)
+
+    def test_dict_methods_see_shared_data(self):
+        shared = {'a': 1, 'b': {'c': 2}}
+        data = proxies.CopyOnWriteDict(shared)
+        self.assertEqual(data.setdefault('a', 0), 1)
+        self.assertEqual(data.setdefault('d', 4), 4)
+        data.update({'a': 5}, e=6)
+        self.assertEqual(data.popitem(), ('e', 6))
+        self.assertEqual(data, {'a': 5, 'b': {'c': 2}, 'd': 4})
+        self.assertEqual(list(reversed(data)), ['d', 'b', 'a'])
+        self.assertEqual(data | {'f': 7}, {'a': 5, 'b': {'c': 2}, 'd': 4, 'f': 7})
+        data.clear()
+        self.assertEqual(len(data), 0)
+        self.assertEqual(list(data.items()), [])
+        with self.assertRaises(KeyError):
+            data.popitem()
+        self.assertEqual(shared, {'a': 1, 'b': {'c': 2}})
+
+    def test_dict_methods_of_lazy_object(self):
+        data = LazyJSONObject(b'{"a": 1, "b": [2]}')
+        data |= {'c': 3}
+        self.assertEqual(data.setdefault('b', None), [2])
+        self.assertEqual(data.popitem(), ('c', 3))
+        data.clear()
+        self.assertEqual(json.dumps(data), '{}')
+        data.update(a=1)
+        self.assertEqual(data.materialize(), {'a': 1})
+
+    def test_copy_on_write_over_buffer(self):
+        adapter = tests.utils.UserAdapter.copy_on_write(
+            tests.utils.UserAdapter.from_buffer(json.dumps(self.shared_data).encode())._raw_data)
+        adapter.profile.last_logged = 'today'
+        adapter.validate()
+        self.assertEqual(adapter.profile.last_logged, 'today')
+
+
+class TestAdapterBulkInsert(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.adapter = tests.utils.UserAdapter(self.user_data)
+
+    def test_update_many_sets_fields_and_free_content(self):
+        self.adapter.update_many({'username': 'daniel', 'hobby': 'cycling', 'city': 'Warsaw'})
+        self.assertEqual(self.adapter.username, 'daniel')
+        self.assertEqual(self.user_data['attributes']['hobby'], 'cycling')
+        self.assertEqual(self.user_data['attributes']['city'], 'Warsaw')
+
+    def test_insert_many_routes_nested_objects(self):
+        appearance = {'last_logged': 'today', 'settings': {'profile_color': 'red', 'stay_logged': False}}
+        self.adapter.insert_many([('hobby', 'cycling'), ('appearance', appearance)])
+        self.assertEqual(self.adapter.attributes.appearance.settings.profile_color, 'red')
+
+    def test_failed_batch_is_not_applied(self):
+        with self.assertRaises(errors.AdapterValidationError):
+            self.adapter.update_many({'username': 'daniel', 'hobby': 'cycling', 'is_active': 'yes'})
+        with self.assertRaises(errors.AdapterValidationError):
+            self.adapter.update_many({'hobby': 'cycling', 'age': 22})
+        self.assertEqual(self.user_data, tests.utils.example_adapter_user_data)
+
+    def test_not_editable_adapter_rejects_batch(self):
+        adapter = tests.utils.UserAdapter(self.user_data, editable=False)
+        with self.assertRaises(errors.AdapterValidationError):
+            adapter.update_many({'username': 'daniel'})
+
+    def test_insert_target_without_batch_support_rejects_batch(self):
+        class TagsTarget(AdapterAttribute, AdapterInsertTarget):
+            def __init__(self):
+                AdapterAttribute.__init__(self, dict)
+                AdapterInsertTarget.__init__(self, insertable=True, insert_type=list)
+
+            def insert_value(self, key, value, owner_instance):
+                owner_instance.serialize_to_raw_data()[self._name][key] = value
+
+        class TaggedAdapter(BaseAdapter):
+            name = AdapterAttribute(str)
+            tags = TagsTarget()
+
+        data = {'name': 'post', 'tags': {}}
+        adapter = TaggedAdapter(data)
+        adapter.insert_value('colors', ['red'])
+        with self.assertRaises(errors.AdapterValidationError):
+            adapter.update_many({'name': 'article', 'sizes': ['big']})
+        self.assertEqual(data, {'name': 'post', 'tags': {'colors': ['red']}})
+
+
+class TestAdapterValidation(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+
+    def test_adapter_validates_proper_data(self):
+        tests.utils.UserAdapter(self.user_data).validate()
+
+    def test_adapter_throw_error_missing_required_with_key(self):
+        del self.user_data['birth_date']
+        with self.assertRaises(errors.AdapterValidationError):
+            tests.utils.UserAdapter(self.user_data).validate()
+
+    def test_required_with_check_does_not_decode_buffer_values(self):
+        adapter = tests.utils.UserAdapter.from_buffer(json.dumps(self.user_data).encode())
+        adapter._raw_data['first_name']
+        tests.utils.UserAdapter.__ordered_fields__['first_name'].validate(adapter)
+        self.assertIsNotNone(adapter._raw_data.raw_span('birth_date'))
+
+
+class TestSpecializedAdapterAttributes(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.adapter = tests.utils.UserAdapter(self.user_data)
+
+    def test_fields_are_specialized_at_class_creation(self):
+        field = tests.utils.UserAdapter.__ordered_fields__['username']
+        self.assertIsNot(type(field), AdapterAttribute)
+        self.assertIsInstance(field, AdapterAttribute)
+        self.assertIs(type(field), type(tests.utils.UserAdapter.__ordered_fields__['email']))
+
+    def test_specialized_fields_keep_validation(self):
+        self.user_data['is_active'] = 1
+        with self.assertRaises(errors.AdapterValidationError):
+            self.adapter.is_active
+        del self.user_data['email']
+        with self.assertRaises(errors.AdapterValidationError):
+            self.adapter.email
+        del self.user_data['birth_date']
+        self.assertIsNone(self.adapter.birth_date)
+
+    def test_specialized_fields_keep_set_validation(self):
+        self.adapter.is_active = False
+        self.assertIs(self.user_data['is_active'], False)
+        with self.assertRaises(errors.AdapterValidationError):
+            self.adapter.is_active = 0
+
+    def test_read_only_fields_are_not_editable(self):
+        class ReadOnlyAdapter(BaseAdapter):
+            username = AdapterAttribute(str, editable=False)
+
+        with self.assertRaises(errors.AdapterValidationError):
+            ReadOnlyAdapter(self.user_data).username = 'daniel'
+
+
+class TestFrozenAdapterRecords(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.user_data['attributes']['appearance'] = {'last_logged': 'today', 'settings': {'profile_color': 'red'}}
+        self.adapter = tests.utils.UserAdapter(self.user_data)
+
+    def test_frozen_record_reads_like_adapter(self):
+        record = self.adapter.freeze()
+        self.assertEqual(record.username, self.adapter.username)
+        self.assertEqual(record.profile.settings.profile_color, 'green')
+        self.assertEqual(record.attributes.job, 'Programmer')
+        self.assertEqual(record.attributes.appearance.settings.profile_color, 'red')
+        self.assertEqual(record.profile_color, self.adapter.profile_color)
+        self.assertEqual(record.job, self.adapter.job)
+        with self.assertRaises(AttributeError):
+            record.unknown
+
+    def test_frozen_record_is_immutable_and_detached(self):
+        record = self.adapter.freeze()
+        with self.assertRaises(AttributeError):
+            record.username = 'daniel'
+        with self.assertRaises(AttributeError):
+            record.attributes.job = 'Tester'
+        self.adapter.username = 'daniel'
+        self.assertEqual(record.username, tests.utils.example_adapter_user_data['username'])
+        self.assertEqual(record.to_raw_data(), dict(self.user_data, username=record.username))
+
+    def test_record_classes_are_shared_and_slotted(self):
+        record = self.adapter.freeze()
+        other = tests.utils.UserAdapter.from_buffer(json.dumps(self.user_data).encode()).freeze()
+        self.assertIs(type(record), type(other))
+        self.assertIs(type(record.profile), type(other.profile))
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(other.profile.last_logged, record.profile.last_logged)
+
+
+class TestAdapterChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.adapter = tests.utils.UserAdapter(self.user_data)
+        self.change_log = self.adapter.track_changes()
+
+    def test_mutations_are_recorded_as_json_patch(self):
+        self.adapter.username = 'daniel'
+        self.adapter.profile.settings.profile_color = 'red'
+        self.adapter.hobby = 'cycling'
+        self.assertEqual(self.change_log.get_patch(), [
+            {'op': 'replace', 'path': '/username', 'value': 'daniel'},
+            {'op': 'replace', 'path': '/profile/settings/profile_color', 'value': 'red'},
+            {'op': 'add', 'path': '/attributes/hobby', 'value': 'cycling'},
+        ])
+
+    def test_patch_is_minimal_since_checkpoint(self):
+        self.adapter.username = 'daniel'
+        self.change_log.checkpoint()
+        self.adapter.hobby = 'cycling'
+        self.adapter.hobby = 'running'
+        self.adapter.profile.last_logged = 'today'
+        self.adapter.profile = {'last_logged': 'now', 'settings': {'profile_color': 'red', 'stay_logged': True}}
+        self.assertEqual(self.change_log.get_patch(), [
+            {'op': 'add', 'path': '/attributes/hobby', 'value': 'running'},
+            {'op': 'replace', 'path': '/profile', 'value': self.user_data['profile']},
+        ])
+        self.change_log.checkpoint()
+        self.assertEqual(self.change_log.get_patch(), [])
+
+    def test_bulk_insert_and_escaped_keys_are_recorded(self):
+        self.adapter.update_many({'email': 'daniel@example.com', 'a/b~c': 'x'})
+        self.assertEqual(self.change_log.get_patch(), [
+            {'op': 'replace', 'path': '/email', 'value': 'daniel@example.com'},
+            {'op': 'add', 'path': '/attributes/a~1b~0c', 'value': 'x'},
+        ])
+
+    def test_untracked_adapter_records_nothing(self):
+        adapter = tests.utils.UserAdapter(deepcopy(tests.utils.example_adapter_user_data))
+        adapter.username = 'daniel'
+        self.assertIsNone(adapter._change_log)
+        self.assertEqual(len(self.change_log), 0)
+
+
+class TestRelationshipResolver(unittest.TestCase):
+    def setUp(self):
+        self.people = [{'type': 'people', 'id': str(i), 'attributes': {'full_name': 'Person %s' % i}} for i in range(3)]
+        self.comments = [{'type': 'comments', 'id': str(i)} for i in range(3)]
+        self.articles = []
+        for i in range(4):
+            self.articles.append({
+                'type': 'articles',
+                'id': str(i),
+                'relationships': {
+                    'author': {'data': {'type': 'people', 'id': str(i % 2)}},
+                    'comments': {'data': [{'type': 'comments', 'id': str(i % 3)}, {'type': 'comments', 'id': '7'}]},
+                    'editor': {'data': None}
+                }
+            })
+        self.loader = relationships.InMemoryLoader(self.people + self.comments)
+        self.resolver = relationships.RelationshipResolver(self.loader)
+
+    def test_relationships_are_loaded_in_one_deduplicated_batch(self):
+        authors = self.resolver.resolve_many(self.articles, 'author')
+        self.assertEqual([a['id'] for a in authors], ['0', '1', '0', '1'])
+        self.assertEqual(self.loader.batches, [[('people', '0'), ('people', '1')]])
+
+    def test_collected_relationships_are_cached(self):
+        self.resolver.collect(self.articles)
+        self.assertEqual(self.resolver.resolve(self.articles[0], 'comments'), [self.comments[0], None])
+        self.assertIs(self.resolver.resolve(self.articles[3], 'author'), self.people[1])
+        self.assertIsNone(self.resolver.resolve(self.articles[0], 'editor'))
+        self.assertEqual(len(self.loader.batches), 1)
+        self.assertEqual(len(self.loader.batches[0]), 6)
+
+    def test_resolver_accepts_adapters(self):
+        adapter = BaseAdapter(self.articles[1])
+        self.assertIs(self.resolver.resolve(adapter, 'author'), self.people[1])
+
+    def test_resolver_reads_only_relationships_of_buffer_adapters(self):
+        article = dict(self.articles[1], attributes={'title': 'Lazy'})
+        adapter = BaseAdapter.from_buffer(json.dumps(article).encode())
+        self.resolver.collect([adapter])
+        self.assertEqual(self.resolver.resolve(adapter, 'author'), self.people[1])
+        self.assertEqual(len(self.loader.batches), 1)
+        self.assertIsNotNone(adapter._raw_data.raw_span('attributes'))
+
+    def test_async_loader(self):
+        async def loader(keys):
+            return self.loader(keys)
+
+        resolver = relationships.RelationshipResolver(loader)
+        authors = asyncio.run(resolver.resolve_many_async(self.articles, 'author'))
+        self.assertEqual([a['id'] for a in authors], ['0', '1', '0', '1'])
+        self.assertEqual(len(self.loader.batches), 1)
+        with self.assertRaises(TypeError):
+            resolver.resolve(self.articles[0], 'comments')
+
+
+class TestAdapterRebinding(unittest.TestCase):
+    def setUp(self):
+        self.first_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.second_data = deepcopy(tests.utils.example_adapter_user_data)
+        self.second_data['username'] = 'daniel'
+        self.second_data['profile']['settings']['profile_color'] = 'red'
+        self.second_data['attributes'] = {'job': 'Tester'}
+
+    def test_rebound_adapter_reads_new_record(self):
+        adapter = tests.utils.UserAdapter(self.first_data)
+        settings = adapter.profile.settings
+        adapter.hobby = 'cycling'
+        self.assertIs(adapter.rebind(self.second_data), adapter)
+        self.assertEqual(adapter.username, 'daniel')
+        self.assertEqual(adapter.profile.settings.profile_color, 'red')
+        self.assertEqual(adapter.job, 'Tester')
+        self.assertIs(adapter.profile.settings, settings)
+        with self.assertRaises(AttributeError):
+            adapter.hobby
+
+    def test_nested_adapters_are_released_on_rebind(self):
+        adapter = tests.utils.UserAdapter(self.first_data)
+        profile = adapter.profile
+        adapter.rebind(self.second_data)
+        self.assertIsNone(profile.serialize_to_raw_data())
+        self.assertIs(adapter.profile, profile)
+        self.assertIs(profile.serialize_to_raw_data(), self.second_data['profile'])
+
+    def test_nested_adapter_follows_replaced_data(self):
+        adapter = tests.utils.UserAdapter(self.first_data)
+        adapter.profile.last_logged
+        adapter.profile = deepcopy(self.second_data['profile'])
+        self.assertEqual(adapter.profile.settings.profile_color, 'red')
+
+    def test_pool_reuses_adapter_per_class(self):
+        adapter_pool = pool.AdapterPool()
+        first = adapter_pool.bind(tests.utils.UserAdapter, self.first_data)
+        second = adapter_pool.bind(tests.utils.UserAdapter, self.second_data)
+        self.assertIs(first, second)
+        self.assertEqual(second.username, 'daniel')
+        with self.assertRaises(ValueError):
+            adapter_pool.bind(tests.utils.UserAdapter, self.first_data, editable=False)
+
+    def test_rebind_drops_nested_adapters_of_free_content_keys(self):
+        self.first_data['attributes']['appearance'] = deepcopy(self.first_data['profile'])
+        adapter = tests.utils.UserAdapter(self.first_data)
+        profile = adapter.profile
+        attributes = adapter.attributes
+        self.assertEqual(attributes.appearance.last_logged, 'yesterday')
+        self.assertIn('appearance', attributes._child_adapters)
+        adapter.rebind(self.second_data)
+        self.assertNotIn('appearance', attributes._child_adapters)
+        self.assertIs(adapter.profile, profile)
+
+    def test_iter_adapted_rebinds_one_adapter(self):
+        usernames = [(a.username, id(a)) for a in pool.iter_adapted(tests.utils.UserAdapter,
+                                                                     [self.first_data, self.second_data])]
+        self.assertEqual([u for u, _ in usernames], [self.first_data['username'], 'daniel'])
+        self.assertEqual(len({i for _, i in usernames}), 1)
+
+    def test_rebind_drops_change_log(self):
+        adapter = tests.utils.UserAdapter(self.first_data)
+        adapter.track_changes()
+        adapter.profile.last_logged = 'today'
+        adapter.rebind(self.second_data)
+        adapter.profile.last_logged = 'now'
+        self.assertIsNone(adapter._change_log)
+        self.assertEqual(self.second_data['profile']['last_logged'], 'now')
+
+
+class TestCompoundDocumentBuilder(unittest.TestCase):
+    def setUp(self):
+        self.people = [{'type': 'people', 'id': str(i), 'attributes': {'full_name': 'Person %s' % i, 'city': 'Warsaw'}}
+                       for i in range(3)]
+        self.articles = []
+        for i in range(4):
+            self.articles.append({
+                'type': 'articles',
+                'id': str(i),
+                'attributes': {'title': 'Article %s' % i, 'body': 'Text'},
+                'links': {'self': 'http://example.com/articles/%s' % i},
+                'relationships': {
+                    'author': {'data': {'type': 'people', 'id': str(i % 2)}},
+                    'related': {'data': [{'type': 'articles', 'id': '0'}, {'type': 'people', 'id': '2'}]}
+                }
+            })
+        self.loader = relationships.InMemoryLoader(self.people + self.articles)
+        self.builder = documents.CompoundDocumentBuilder(relationships.RelationshipResolver(self.loader))
+
+    def build(self, builder, **kwargs):
+        fp = io.BytesIO()
+        builder.write(fp, **kwargs)
+        document = json.loads(fp.getvalue())
+        json_api.JSONApiSchema().get_validator().validate(document)
+        return document
+
+    def test_included_resources_are_deduplicated(self):
+        self.builder.add_many(self.articles)
+        document = self.build(self.builder)
+        self.assertEqual(document['data'], self.articles)
+        self.assertEqual([(r['type'], r['id']) for r in document['included']],
+                         [('people', '0'), ('people', '2'), ('people', '1')])
+        self.assertEqual(len(self.loader.batches), 1)
+
+    def test_buffer_adapters_are_added_without_copies(self):
+        adapters = [BaseAdapter.from_buffer(json.dumps(article).encode()) for article in self.articles]
+        self.builder.add_many(adapters)
+        document = self.build(self.builder)
+        self.assertEqual(document['data'], self.articles)
+        for adapter in adapters:
+            self.assertIsNotNone(adapter._raw_data.raw_span('attributes'))
+
+    def test_included_relationships_can_be_limited(self):
+        builder = documents.CompoundDocumentBuilder(relationships.RelationshipResolver(self.loader), include=['author'])
+        builder.add_many(BaseAdapter(a) for a in self.articles[:1])
+        document = self.build(builder)
+        self.assertEqual([(r['type'], r['id']) for r in document['included']], [('people', '0')])
+
+    def test_sparse_fieldsets(self):
+        builder = documents.CompoundDocumentBuilder(relationships.RelationshipResolver(self.loader),
+                                                    fields={'articles': 'title,author', 'people': ['full_name']})
+        builder.add(self.articles[1])
+        document = self.build(builder, single=True)
+        self.assertEqual(document['data'], {
+            'type': 'articles',
+            'id': '1',
+            'links': self.articles[1]['links'],
+            'attributes': {'title': 'Article 1'},
+            'relationships': {'author': self.articles[1]['relationships']['author']}
+        })
+        self.assertEqual(document['included'][0], {'type': 'people', 'id': '1', 'attributes': {'full_name': 'Person 1'}})
+
+    def test_document_without_resolver_has_no_included(self):
+        builder = documents.CompoundDocumentBuilder()
+        builder.add_many(self.articles)
+        document = self.build(builder, buffer_size=16)
+        self.assertNotIn('included', document)
+        self.assertEqual(len(document['data']), 4)
+
+    def test_empty_documents_are_valid(self):
+        self.assertEqual(self.build(documents.CompoundDocumentBuilder()), {'data': []})
+        self.assertEqual(self.build(documents.CompoundDocumentBuilder(), single=True), {'data': None})
+        self.articles[0]['relationships'] = {'author': {'data': None}, 'related': {'data': []}}
+        builder = documents.CompoundDocumentBuilder(relationships.RelationshipResolver(self.loader))
+        builder.add(self.articles[0])
+        self.assertNotIn('included', self.build(builder, single=True))
+        with self.assertRaises(errors.StructuredValidationError):
+            json_api.JSONApiSchema().get_validator().validate({'included': []})
@@ -0,0 +1,272 @@
+import copy
+import gc
+import json
+import os
+import time
+import unittest
+
+import json_api
+import schema
+import sharding
+from for_restructuring.base import AdapterAttribute, BaseAdapter
+from for_restructuring.changes import ChangeLog
+from for_restructuring.lazy import LazyJSONObject
+from for_restructuring.mixture import AdapterFreeContent, AdapterObjectAttribute
+
+SMALL_SIZE = 100
+GROWTH = 8
+# measured growth may exceed the linear model by this factor before a test fails,
+# a quadratic path grows GROWTH times more than allowed
+TOLERANCE = 2.5
+REPEAT = 5
+AVAILABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+def measure(func):
+    # best of several runs of at least a few milliseconds, so timer resolution and noise matter little
+    runs = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(runs):
+            func()
+        if time.perf_counter() - started > 0.005:
+            break
+        runs *= 2
+
+    gc.disable()
+    try:
+        timings = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            for _ in range(runs):
+                func()
+            timings.append((time.perf_counter() - started) / runs)
+    finally:
+        gc.enable()
+    return min(timings)
+
+
+def create_wide_schema(size):
+    attributes = {'f%s' % i: schema.SchemaAttribute(data_type=str, required_with=['f%s' % ((i + 1) % size)])
+                  for i in range(size)}
+    return type('WideSchema%s' % size, (schema.Schema,), attributes)
+
+
+def create_wide_data(size):
+    return {'f%s' % i: 'value' for i in range(size)}
+
+
+def create_deep_schema(depth):
+    attribute_class = type('Level0', (schema.SchemaCompoundedAttribute,), {'leaf': schema.SchemaAttribute(str)})
+    for level in range(1, depth):
+        attribute_class = type('Level%s' % level, (schema.SchemaCompoundedAttribute,), {
+            'child': attribute_class(),
+            'leaf': schema.SchemaAttribute(str)
+        })
+    return type('DeepSchema%s' % depth, (schema.Schema,), {'root': attribute_class()})
+
+
+def create_deep_data(depth):
+    data = {'leaf': 'value'}
+    for _ in range(1, depth):
+        data = {'child': data, 'leaf': 'value'}
+    return {'root': data}
+
+
+class PostItem(schema.SchemaCompoundedAttribute):
+    title = schema.SchemaAttribute(data_type=str)
+    likes = schema.SchemaAttribute(data_type=int, required=False, required_with=['title'])
+
+
+class PostsSchema(schema.Schema):
+    posts = schema.SchemaCollectionAttribute(inner_attribute=PostItem())
+
+
+class FreeContentSchema(schema.Schema):
+    attributes = schema.SchemaFreeContentCompoundedAttribute(
+        mapping={str: schema.SchemaAttribute(data_type=str), int: schema.SchemaAttribute(data_type=int)},
+        key_patterns=[(schema.KeyPrefix('count_'), schema.SchemaAttribute(data_type=int))]
+    )
+
+
+def create_wide_adapter_class(size):
+    return type('WideAdapter%s' % size, (BaseAdapter,), {'f%s' % i: AdapterAttribute(str) for i in range(size)})
+
+
+def create_deep_adapter_class(depth):
+    attribute_class = type('Level0Adapter', (AdapterObjectAttribute,), {'leaf': AdapterAttribute(str)})
+    for level in range(1, depth):
+        attribute_class = type('Level%sAdapter' % level, (AdapterObjectAttribute,), {
+            'child': attribute_class(searchable=True),
+            'value': AdapterAttribute(str)
+        })
+    return type('DeepAdapter%s' % depth, (BaseAdapter,), {'root': attribute_class(searchable=True)})
+
+
+def create_deep_adapter_data(depth):
+    data = {'leaf': 'value'}
+    for _ in range(1, depth):
+        data = {'child': data, 'value': 'value'}
+    return {'root': data}
+
+
+def create_json_api_buffer(size):
+    data = [{
+        'type': 'articles',
+        'id': str(i),
+        'attributes': {'title': 'Article [%s] {draft}' % i, 'body': 'Text of the article, ' * 6 + 'with "quotes".',
+                       'tags': ['json', 'api'], 'stats': {'views': i, 'ratings': [1, 2, {'stars': None}]}},
+        'relationships': {'author': {'data': {'type': 'people', 'id': str(i % 7)}}}
+    } for i in range(size)]
+    document = {'jsonapi': {'version': '1.0'}, 'meta': {'total': size}, 'data': data, 'links': {'self': '/articles'}}
+    return json.dumps(document).encode()
+
+
+def create_json_api_collection_buffer(size):
+    document = copy.deepcopy(json_api.raw_data)
+    item = document['data'][0]
+    document['data'] = []
+    for i in range(size):
+        item = copy.deepcopy(item)
+        item['id'] = str(i)
+        document['data'].append(item)
+    return json.dumps(document).encode()
+
+
+class TestLinearScaling(unittest.TestCase):
+    def assertLinearGrowth(self, create_case, small_size=SMALL_SIZE):
+        large_size = small_size * GROWTH
+        small = measure(create_case(small_size))
+        large = measure(create_case(large_size))
+        growth = large / small
+        self.assertLessEqual(growth, GROWTH * TOLERANCE,
+                             'Time grew %.1f times for %s times bigger input' % (growth, GROWTH))
+
+
+class TestValidationScaling(TestLinearScaling):
+    def test_wide_objects(self):
+        def create_case(size):
+            validator = create_wide_schema(size)().get_validator()
+            data = create_wide_data(size)
+            return lambda: validator.validate(data)
+
+        self.assertLinearGrowth(create_case)
+
+    def test_long_collections(self):
+        validator = PostsSchema().get_validator()
+
+        def create_case(size):
+            data = {'posts': [{'title': 'Post %s' % i, 'likes': i} for i in range(size)]}
+            return lambda: validator.validate(data)
+
+        self.assertLinearGrowth(create_case)
+
+    def test_deep_nesting(self):
+        def create_case(depth):
+            validator = create_deep_schema(depth)().get_validator()
+            data = create_deep_data(depth)
+            return lambda: validator.validate(data)
+
+        self.assertLinearGrowth(create_case, small_size=20)
+
+    def test_free_content_keys(self):
+        validator = FreeContentSchema().get_validator()
+
+        def create_case(size):
+            data = {'attributes': {}}
+            for i in range(size):
+                data['attributes']['key_%s' % i] = 'value'
+                data['attributes']['count_%s' % i] = i + 1
+            return lambda: validator.validate(data)
+
+        self.assertLinearGrowth(create_case)
+
+
+class TestAdapterScaling(TestLinearScaling):
+    def test_wide_adapter_access(self):
+        def create_case(size):
+            adapter = create_wide_adapter_class(size)(create_wide_data(size))
+            names = list(adapter.get_adapter_fields())
+            return lambda: [getattr(adapter, name) for name in names]
+
+        self.assertLinearGrowth(create_case)
+
+    def test_wide_adapter_validation(self):
+        def create_case(size):
+            adapter = create_wide_adapter_class(size)(create_wide_data(size))
+            return adapter.validate
+
+        self.assertLinearGrowth(create_case)
+
+    def test_deep_adapter_search(self):
+        def create_case(depth):
+            adapter = create_deep_adapter_class(depth)(create_deep_adapter_data(depth))
+            return lambda: adapter.leaf
+
+        self.assertLinearGrowth(create_case, small_size=20)
+
+    def test_free_content_adapter_access(self):
+        def create_case(size):
+            data = {'key_%s' % i: 'value' for i in range(size)}
+            adapter = AdapterFreeContent(data, mapping={str: AdapterAttribute(str)})
+            names = list(data)
+            return lambda: [getattr(adapter, name) for name in names]
+
+        self.assertLinearGrowth(create_case)
+
+    def test_change_log_patch(self):
+        def create_case(size):
+            change_log = ChangeLog()
+            for i in range(size):
+                change_log.record_set('/attributes/key_%s' % i, 'value', i, False)
+                change_log.record_set('/attributes', 'key_%s' % i, {'value': i}, True)
+            return change_log.get_patch
+
+        self.assertLinearGrowth(create_case)
+
+
+class TestLazyBufferSpeed(unittest.TestCase):
+    def test_reading_few_fields_is_faster_than_json_loads(self):
+        buffer = create_json_api_buffer(1500)
+        self.assertGreater(len(buffer), 500 * 1024)
+
+        def read_lazy():
+            document = LazyJSONObject(buffer)
+            return document['jsonapi'], document['meta'], document['data'][0]['type'], document['data'][0]['id']
+
+        def read_loaded():
+            document = json.loads(buffer)
+            return document['jsonapi'], document['meta'], document['data'][0]['type'], document['data'][0]['id']
+
+        self.assertEqual(read_lazy(), read_loaded())
+        # measured in turns, so a noisy moment does not favour one of them
+        lazy_timings, loaded_timings = [], []
+        for _ in range(3):
+            lazy_timings.append(measure(read_lazy))
+            loaded_timings.append(measure(read_loaded))
+        self.assertLess(min(lazy_timings), min(loaded_timings))
+
+
+@unittest.skipIf(AVAILABLE_CPUS < 2, 'sharded validation needs at least two CPUs to be faster')
+class TestShardedValidationSpeed(unittest.TestCase):
+    def test_sharded_validation_is_faster_than_serial(self):
+        buffer = create_json_api_collection_buffer(20000)
+        validator = json_api.JSONApiSchema().get_validator()
+        sharded_validator = sharding.ShardedCollectionValidator(json_api.JSONApiSchema, workers=min(AVAILABLE_CPUS, 4),
+                                                                chunk_size=len(buffer) // 16)
+
+        def validate_serially():
+            validator.validate(json.loads(buffer))
+            return []
+
+        def validate_sharded():
+            return sharded_validator.find_failures(buffer)
+
+        # runs take seconds, so a single run of each is measured, in turns
+        serial_timings, sharded_timings = [], []
+        for _ in range(2):
+            for validate, timings in ((validate_serially, serial_timings), (validate_sharded, sharded_timings)):
+                started = time.perf_counter()
+                self.assertEqual(validate(), [])
+                timings.append(time.perf_counter() - started)
+        self.assertLess(min(sharded_timings), min(serial_timings))
@@ -0,0 +1,99 @@
+import threading
+import unittest
+from copy import deepcopy
+
+import tests.utils
+import errors
+import metrics
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry(buckets=(0.1, 1.0))
+
+    def test_registry_merges_counters_from_threads(self):
+        def record():
+            for _ in range(100):
+                self.registry.increment('requests_total', (('schema', 'User'),))
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        counters = self.registry.snapshot()['counters']['requests_total']
+        self.assertEqual(counters, [{'labels': {'schema': 'User'}, 'value': 400}])
+
+    def test_registry_exports_prometheus_histogram(self):
+        self.registry.observe('latency_seconds', 0.05)
+        self.registry.observe('latency_seconds', 0.1)
+        self.registry.observe('latency_seconds', 2)
+        text = self.registry.to_prometheus_text()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count 3', text)
+
+    def test_registry_escapes_label_values(self):
+        self.registry.increment('failures_total', (('path', 'a"b'),))
+        self.assertIn('failures_total{path="a\\"b"} 1', self.registry.to_prometheus_text())
+
+
+class TestValidationMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.enable()
+        self.user_data = deepcopy(tests.utils.example_compounded_user_data)
+        self.validator = tests.utils.UserCompoundedSchema().get_validator()
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_validator_records_documents_and_failures(self):
+        self.validator.validate(self.user_data)
+        self.user_data['profile']['last_logged'] = 2
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data)
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['counters'][metrics.DOCUMENTS_VALIDATED][0]['value'], 2)
+        self.assertEqual(snapshot['counters'][metrics.VALIDATION_FAILURES][0]['labels'],
+                         {'schema': 'UserCompoundedSchema', 'path': 'profile/last_logged'})
+        self.assertEqual(snapshot['histograms'][metrics.VALIDATION_SECONDS][0]['count'], 2)
+
+    def test_failure_path_label_collapses_indexes_and_free_content_keys(self):
+        cases = (
+            (tests.utils.UserWithCollectionAttributeSchema, tests.utils.example_collection_user_data,
+             ('posts', 1, 'tags', 0), 3, 'posts/[*]/tags/[*]'),
+            (tests.utils.UserWithFreeContentAttributesSchema, tests.utils.example_free_content_user_data,
+             ('attributes', 'nickname'), 5, 'attributes/*'),
+            (tests.utils.UserWithFreeContentAttributesSchema, tests.utils.example_free_content_user_data,
+             ('attributes', 'appearance', 'height'), 174, 'attributes/*/height'),
+        )
+        for schema_class, example_data, path, value, label in cases:
+            data = deepcopy(example_data)
+            parent = data
+            for segment in path[:-1]:
+                parent = parent[segment]
+            parent[path[-1]] = value
+            with self.assertRaises(errors.StructuredValidationError) as context:
+                schema_class().get_validator().validate(data)
+            self.assertEqual(context.exception.path, path)
+            self.assertEqual(metrics.get_error_path_label(context.exception), label)
+            collected = schema_class().get_validator().collect_errors(data)
+            self.assertEqual([metrics.get_error_path_label(e) for e in collected], [label])
+
+    def test_adapter_records_operations(self):
+        adapter = tests.utils.UserAdapter(deepcopy(tests.utils.example_adapter_user_data))
+        adapter.username
+        adapter.username = 'daniel'
+        adapter.profile_color
+        adapter.validate()
+        counters = self.registry.snapshot()['counters']
+        self.assertEqual(counters[metrics.ADAPTER_WRITES][0]['value'], 1)
+        self.assertEqual(counters[metrics.ADAPTER_SEARCHES][0]['value'], 1)
+        self.assertEqual(counters[metrics.ADAPTERS_VALIDATED][0], {'labels': {'adapter': 'UserAdapter'}, 'value': 1})
+
+    def test_disabled_metrics_record_nothing(self):
+        metrics.disable()
+        self.validator.validate(self.user_data)
+        self.assertEqual(self.registry.snapshot(), {'counters': {}, 'histograms': {}})
@@ -1,6 +1,7 @@
 import unittest
 from copy import deepcopy
 
+import json_api
 import tests.utils
 import validators
 
@@ -67,4 +68,29 @@ class TestSchemaCollectionAttribute(unittest.TestCase):
 
     def test_schema_properly_generates_validator_object(self):
         self.assertIsInstance(self.validator._child_validators[-1], validators.CollectionAttributeValidator)
-        self.assertIsInstance(self.validator._child_validators[-1]._inner_validator, validators.CompoundedAttributeValidator)
\ No newline at end of file
+        self.assertIsInstance(self.validator._child_validators[-1]._inner_validator, validators.CompoundedAttributeValidator)
+
+
+class TestSchemaDiscriminatedAttribute(unittest.TestCase):
+    def setUp(self):
+        schema_class = json_api.create_typed_schema_class({'articles': tests.utils.ArticleItem()})
+        self.validator = schema_class().get_validator()
+
+    def test_schema_properly_generates_validator_object(self):
+        collection_validator = self.validator._child_validators[0]._mapping[list]
+        self.assertIsInstance(collection_validator._inner_validator, validators.DiscriminatedAttributeValidator)
+        self.assertIsInstance(collection_validator._inner_validator._mapping['articles'], validators.CompoundedAttributeValidator)
+
+
+class TestSchemaSharedValidators(unittest.TestCase):
+    def test_schema_reuses_identical_validator_subtrees(self):
+        validator = json_api.JSONApiSchema().get_validator()
+        data_mapping = validator._child_validators[0]._mapping
+        self.assertIs(data_mapping[dict], data_mapping[list]._inner_validator)
+
+    def test_schema_returns_shared_validator(self):
+        self.assertIs(tests.utils.UserSchema().get_validator(), tests.utils.UserSchema().get_validator())
+
+    def test_schema_not_shares_validators_with_different_names(self):
+        child_validators = tests.utils.UserSchema().get_validator()._child_validators
+        self.assertIsNot(child_validators[0], child_validators[2])
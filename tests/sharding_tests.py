@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+from copy import deepcopy
+
+import errors
+import json_api
+import sharding
+
+
+class TestShardedCollectionValidator(unittest.TestCase):
+    def setUp(self):
+        self.data = deepcopy(json_api.raw_data)
+        item = self.data['data'][0]
+        self.data['data'] = []
+        for i in range(20):
+            item = deepcopy(item)
+            item['id'] = str(i)
+            self.data['data'].append(item)
+        self.validator = sharding.ShardedCollectionValidator(json_api.JSONApiSchema, workers=2, chunk_size=2000)
+
+    def test_validator_not_throw_errors_for_proper_data(self):
+        self.validator.validate(json.dumps(self.data).encode())
+
+    def test_validator_merges_failing_items(self):
+        self.data['data'][3]['id'] = 3
+        del self.data['data'][15]['attributes']['title']
+        self.data['data'][15]['attributes']['title'] = 2
+        with self.assertRaises(errors.ShardedValidationError) as context:
+            self.validator.validate(json.dumps(self.data).encode())
+        failures = context.exception.failures
+        self.assertEqual([(index, path) for index, path, _ in failures],
+                         [(3, 'data/[3]/id'), (15, 'data/[15]/attributes/title')])
+        self.assertIsInstance(context.exception, errors.AdapterValidationError)
+
+    def test_validator_reads_memory_mapped_file(self):
+        self.data['data'][7]['type'] = ''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'document.json')
+            with open(path, 'w') as f:
+                json.dump(self.data, f)
+            failures = self.validator.find_failures_in_file(path)
+        self.assertEqual([index for index, _, _ in failures], [7])
+
+    def test_validator_matches_serial_validation_for_single_process(self):
+        validator = sharding.ShardedCollectionValidator(json_api.JSONApiSchema, workers=1, chunk_size=2000)
+        self.data['data'][19]['links'] = []
+        failures = validator.find_failures(json.dumps(self.data).encode())
+        self.assertEqual([(index, path) for index, path, _ in failures], [(19, 'data/[19]/links')])
+
+    def test_validator_validates_collection_constraints(self):
+        self.data['data'] = 'nothing'
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(json.dumps(self.data).encode())
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(b'[]')
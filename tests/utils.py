@@ -1,5 +1,8 @@
+import json_api
 import schema
 import copy
+from for_restructuring.base import AdapterAttribute, BaseAdapter
+from for_restructuring.mixture import AdapterObjectAttribute, AdapterObjectFreeContentAttribute
 
 example_user_data = {
     'username': 'faderskd',
@@ -101,3 +104,68 @@ example_collection_user_data.update(posts_data)
 
 class UserWithCollectionAttributeSchema(UserWithFreeTypeAttributeSchema):
     posts = schema.SchemaCollectionAttribute(inner_attribute=Post())
+
+
+class SettingsAdapter(AdapterObjectAttribute):
+    profile_color = AdapterAttribute(str)
+    stay_logged = AdapterAttribute(bool)
+
+
+class ProfileAdapter(AdapterObjectAttribute):
+    last_logged = AdapterAttribute(str)
+    settings = SettingsAdapter(searchable=True)
+
+
+user_adapter_attribute_mapping = {
+    str: AdapterAttribute(data_type=str),
+    dict: ProfileAdapter()
+}
+
+
+class UserAdapter(BaseAdapter):
+    username = AdapterAttribute(str)
+    first_name = AdapterAttribute(str, required=False, required_with=['birth_date'])
+    email = AdapterAttribute(str)
+    is_active = AdapterAttribute(bool)
+    birth_date = AdapterAttribute(str, required=False)
+    profile = ProfileAdapter(searchable=True)
+    attributes = AdapterObjectFreeContentAttribute(mapping=user_adapter_attribute_mapping, searchable=True, insertable=True)
+
+
+example_adapter_user_data = copy.deepcopy(example_compounded_user_data)
+example_adapter_user_data.update({
+    'attributes': {
+        'surname': 'Kolik',
+        'job': 'Programmer'
+    }
+})
+
+
+class UserWithKeyPatternAttributesSchema(schema.Schema):
+    attributes = schema.SchemaFreeContentCompoundedAttribute(
+        mapping=user_attribute_mapping,
+        key_patterns=[
+            (schema.KeyPrefix('count_'), schema.SchemaAttribute(data_type=int)),
+            (r'flag-[a-z]+', schema.SchemaAttribute(data_type=bool)),
+        ]
+    )
+
+
+class ArticleAttributes(schema.SchemaCompoundedAttribute):
+    title = schema.SchemaAttribute(data_type=str)
+
+
+class ArticleItem(json_api.MainDataItem):
+    type = schema.SchemaAttribute(data_type=str)
+    id = schema.SchemaAttribute(data_type=str)
+    attributes = ArticleAttributes()
+
+
+class PersonAttributes(schema.SchemaCompoundedAttribute):
+    full_name = schema.SchemaAttribute(data_type=str)
+
+
+class PersonItem(json_api.MainDataItem):
+    type = schema.SchemaAttribute(data_type=str)
+    id = schema.SchemaAttribute(data_type=str)
+    attributes = PersonAttributes()
@@ -1,8 +1,12 @@
+import re
 import unittest
 from copy import deepcopy
+from unittest import mock
 
 import tests.utils
 import errors
+import json_api
+import validators
 
 
 class TestValidatorWithSimpleSchemaAttributes(unittest.TestCase):
@@ -168,3 +172,301 @@ class TestValidatorWithCollectionSchemaAttributes(unittest.TestCase):
         self.user_data['posts'][1] = 'hello'
         with self.assertRaises(errors.AdapterValidationError):
             self.validator.validate(self.user_data)
+
+
+class TestValidatorWithSelectedPaths(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_collection_user_data)
+        self.user_schema = tests.utils.UserWithCollectionAttributeSchema()
+        self.validator = self.user_schema.get_validator()
+
+    def test_validator_not_throw_error_for_unselected_path(self):
+        self.user_data['posts'][1]['tags'] = 123
+        self.validator.validate(self.user_data, only=['posts/*/title'])
+
+    def test_validator_throw_error_for_selected_path(self):
+        self.user_data['posts'][1]['title'] = 123
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data, only=['posts/*/title'])
+
+    def test_validator_throw_error_for_selected_index(self):
+        self.user_data['posts'][1]['tags'] = 123
+        self.validator.validate(self.user_data, only=['posts/[0]'])
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data, only=['posts/1/tags'])
+
+    def test_validator_validates_ancestors_of_selected_path(self):
+        self.user_data['posts'] = 'no posts'
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data, only=['posts/*/title'])
+
+    def test_validator_caches_selected_validators(self):
+        selected = self.validator.get_selected_validator(['posts/*/title', 'posts/*/tags'])
+        self.assertIs(selected, self.validator.get_selected_validator(['posts/*/tags', 'posts/*/title']))
+
+    def test_selected_validators_cache_is_bounded(self):
+        validator = self.user_schema.get_validator().select(validators.build_selector_tree(['posts']))
+        first = validator.get_selected_validator(['posts/[0]'])
+        with mock.patch.object(validators, 'SELECTED_VALIDATORS_CACHE_SIZE', 3):
+            for index in range(1, 10):
+                validator.get_selected_validator(['posts/[%s]' % index])
+                self.assertLessEqual(len(validator._selected_validators), 3)
+            recent = validator.get_selected_validator(['posts/[9]'])
+            validator.get_selected_validator(['posts/[10]'])
+            self.assertIs(recent, validator.get_selected_validator(['posts/[9]']))
+        self.assertIsNot(first, validator.get_selected_validator(['posts/[0]']))
+
+
+class TestValidatorWithSelectedFreeContentPaths(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_free_content_user_data)
+        self.user_schema = tests.utils.UserWithFreeContentAttributesSchema()
+        self.validator = self.user_schema.get_validator()
+
+    def test_validator_validates_only_selected_free_content_keys(self):
+        self.user_data['attributes']['surname'] = 2
+        self.validator.validate(self.user_data, only=['attributes/appearance'])
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data, only=['attributes/surname'])
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data, only=['attributes/*'])
+
+    def test_validator_validates_sparse_fieldsets(self):
+        data = deepcopy(json_api.raw_data)
+        data['data'][0]['attributes']['body'] = 1
+        validator = json_api.JSONApiSchema().get_validator()
+        validator.validate(data, only=json_api.get_sparse_fieldset_selectors({'articles': 'title,author'}))
+        with self.assertRaises(errors.AdapterValidationError):
+            validator.validate(data, only=json_api.get_sparse_fieldset_selectors({'articles': 'title,body'}))
+
+
+class TestValidatorWithFreeContentKeyPatterns(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_free_content_user_data)
+        self.user_data['attributes'].update({'count_posts': 4, 'count_comments': 10, 'flag-active': True})
+        self.user_schema = tests.utils.UserWithKeyPatternAttributesSchema()
+        self.validator = self.user_schema.get_validator()
+
+    def test_validator_not_throw_errors_for_proper_data(self):
+        self.validator.validate(self.user_data)
+
+    def test_validator_throw_error_for_incorrect_prefixed_key_type(self):
+        self.user_data['attributes']['count_likes'] = 'many'
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data)
+
+    def test_validator_throw_error_for_incorrect_regex_key_type(self):
+        self.user_data['attributes']['flag-hidden'] = 'no'
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data)
+
+    def test_validator_falls_back_to_type_mapping(self):
+        self.user_data['attributes']['flag_hidden'] = 'no'
+        self.validator.validate(self.user_data)
+        self.user_data['attributes']['flags'] = False
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data)
+
+    def test_validator_validates_selected_pattern_keys(self):
+        self.user_data['attributes']['count_likes'] = 'many'
+        self.validator.validate(self.user_data, only=['attributes/count_posts'])
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.user_data, only=['attributes/count_likes'])
+
+    def test_key_patterns_with_groups_and_backreferences(self):
+        matcher = validators.compile_key_patterns([
+            r'(?P<word>[a-z]+)-(?P=word)', r'([0-9])\1', validators.KeyPrefix('count_'), r'(x)-.*',
+        ])
+        self.assertEqual(matcher.match('ab-ab'), 0)
+        self.assertIsNone(matcher.match('ab-cd'))
+        self.assertEqual(matcher.match('33'), 1)
+        self.assertIsNone(matcher.match('34'))
+        self.assertEqual(matcher.match('count_x-1'), 2)
+        self.assertEqual(matcher.match('x-1'), 3)
+
+    def test_key_patterns_with_inline_and_compiled_flags(self):
+        matcher = validators.compile_key_patterns([
+            r'(?i)flag-.*', re.compile(r'\w+-[0-9]', re.ASCII), re.compile(r'(?s)dot-.*'), r'[a-z]+',
+        ])
+        self.assertEqual(matcher.match('FLAG-x'), 0)
+        self.assertEqual(matcher.match('word-1'), 1)
+        self.assertIsNone(matcher.match('sł-1'))
+        self.assertEqual(matcher.match('dot-\n'), 2)
+        self.assertEqual(matcher.match('plain'), 3)
+        self.assertIsNone(matcher.match('Plain'))
+
+
+class TestValidatorWithDiscriminatedAttributes(unittest.TestCase):
+    def setUp(self):
+        self.data = deepcopy(json_api.raw_data)
+        self.data['data'].append({'type': 'people', 'id': '9', 'attributes': {'full_name': 'Dan'}})
+        self.schema_class = json_api.create_typed_schema_class({
+            'articles': tests.utils.ArticleItem(),
+            'people': tests.utils.PersonItem()
+        })
+        self.validator = self.schema_class().get_validator()
+
+    def test_validator_not_throw_errors_for_proper_data(self):
+        self.validator.validate(self.data)
+        self.data['data'] = self.data['data'][1]
+        self.validator.validate(self.data)
+
+    def test_validator_uses_schema_of_item_type(self):
+        del self.data['data'][0]['attributes']['title']
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.data)
+
+    def test_validator_throw_error_for_unknown_type(self):
+        self.data['data'][1]['type'] = 'comments'
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.data)
+
+    def test_validator_uses_default_schema_for_unknown_type(self):
+        self.data['data'][1]['type'] = 'comments'
+        schema_class = json_api.create_typed_schema_class({'articles': tests.utils.ArticleItem()}, default=json_api.MainDataItem())
+        schema_class().get_validator().validate(self.data)
+
+    def test_validator_throw_error_for_missing_discriminator(self):
+        del self.data['data'][1]['type']
+        with self.assertRaises(errors.AdapterValidationError):
+            self.validator.validate(self.data)
+
+
+class TestAdaptiveValidatorOrdering(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_user_data)
+        self.validator = tests.utils.UserSchema().get_validator()
+        self.failing_data = dict(self.user_data, is_active='yes')
+
+    def train(self, validator):
+        for _ in range(validators.ChildValidatorsOrdering.REORDER_INTERVAL * 2):
+            with self.assertRaises(errors.AdapterValidationError):
+                validator.validate(self.failing_data)
+
+    def test_often_failing_children_run_first(self):
+        adaptive = self.validator.adaptive()
+        self.train(adaptive)
+        self.assertEqual(adaptive._ordering.ordered_validators[0].name, 'is_active')
+        adaptive.validate(self.user_data)
+
+    def test_error_parity_reports_first_declared_error(self):
+        data = dict(self.failing_data)
+        del data['username']
+        with self.assertRaises(errors.AdapterValidationError) as expected:
+            self.validator.validate(data)
+
+        adaptive = self.validator.adaptive()
+        self.train(adaptive)
+        with self.assertRaises(errors.AdapterValidationError) as reported:
+            adaptive.validate(data)
+        self.assertEqual(str(reported.exception), str(expected.exception))
+
+        adaptive = self.validator.adaptive(error_parity=False)
+        self.train(adaptive)
+        with self.assertRaises(errors.AdapterValidationError) as reported:
+            adaptive.validate(data)
+        self.assertIn('is_active', str(reported.exception))
+
+    def test_adaptive_validator_does_not_change_shared_validators(self):
+        validator = tests.utils.UserWithCollectionAttributeSchema().get_validator()
+        adaptive = validator.adaptive()
+        adaptive.validate(deepcopy(tests.utils.example_collection_user_data))
+        adaptive.validate(deepcopy(tests.utils.example_collection_user_data), only=['posts'])
+        self.assertIsNone(validator._ordering)
+        self.assertIsNone(tests.utils.UserWithCollectionAttributeSchema().get_validator()._ordering)
+        self.assertTrue(all(getattr(child, '_ordering', None) is None for child in validator._child_validators))
+
+
+class TestValidatorWithLimits(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_collection_user_data)
+        self.validator = tests.utils.UserWithCollectionAttributeSchema().get_validator()
+
+    def assertLimitExceeded(self, limits, data, limit):
+        with self.assertRaises(errors.ValidationLimitExceeded) as context:
+            self.validator.limited(limits).validate(data)
+        self.assertEqual(context.exception.limit, limit)
+        return context.exception
+
+    def test_limited_validator_not_throw_errors_for_proper_data(self):
+        limits = validators.ValidationLimits(max_depth=4, max_collection_length=10, max_free_content_keys=10,
+                                             max_nodes=100, time_budget=10)
+        self.validator.limited(limits).validate(self.user_data)
+        self.validator.limited(limits).validate(self.user_data, only=['posts'])
+
+    def test_validator_throw_error_for_too_long_collection(self):
+        self.user_data['posts'] = self.user_data['posts'] * 10
+        error = self.assertLimitExceeded(validators.ValidationLimits(max_collection_length=5), self.user_data,
+                                         'max_collection_length')
+        self.assertEqual(errors.get_error_path(error), 'posts')
+
+    def test_validator_throw_error_for_too_deep_data(self):
+        self.assertLimitExceeded(validators.ValidationLimits(max_depth=1), self.user_data, 'max_depth')
+
+    def test_validator_throw_error_for_too_many_nodes(self):
+        self.assertLimitExceeded(validators.ValidationLimits(max_nodes=5), self.user_data, 'max_nodes')
+
+    def test_validator_throw_error_for_exceeded_time_budget(self):
+        self.user_data['posts'] = self.user_data['posts'] * 1000
+        self.assertLimitExceeded(validators.ValidationLimits(time_budget=0), self.user_data, 'time_budget')
+
+    def test_validator_throw_error_for_too_many_free_content_keys(self):
+        validator = tests.utils.UserWithKeyPatternAttributesSchema().get_validator()
+        data = deepcopy(tests.utils.example_free_content_user_data)
+        data['attributes'].update({'count_%s' % i: i + 1 for i in range(1000)})
+        with self.assertRaises(errors.ValidationLimitExceeded):
+            validator.limited(validators.ValidationLimits(max_free_content_keys=100)).validate(data)
+        validator.limited(validators.ValidationLimits(max_free_content_keys=2000)).validate(data)
+
+    def test_limits_do_not_change_shared_validators(self):
+        self.validator.limited(validators.ValidationLimits(max_depth=1))
+        self.user_data['posts'] = self.user_data['posts'] * 10
+        self.validator.validate(self.user_data)
+
+
+class TestValidatorCollectingErrors(unittest.TestCase):
+    def setUp(self):
+        self.user_data = deepcopy(tests.utils.example_collection_user_data)
+        self.validator = tests.utils.UserWithCollectionAttributeSchema().get_validator()
+        self.user_data['posts'][0]['title'] = 5
+        del self.user_data['posts'][1]['title']
+
+    def test_all_errors_are_collected(self):
+        collected = self.validator.collect_errors(self.user_data)
+        self.assertEqual([(e.path, e.kind) for e in collected], [
+            (('posts', 0, 'title'), errors.INCORRECT_TYPE),
+            (('posts', 1, 'title'), errors.MISSING_KEY),
+        ])
+        self.assertEqual(collected[0].as_dict(), {
+            'path': ['posts', 0, 'title'],
+            'kind': errors.INCORRECT_TYPE,
+            'expected': 'str',
+            'actual': 'int',
+            'message': 'Incorrect data type for key "posts/[0]/title"'
+        })
+
+    def test_first_collected_error_is_the_raised_one(self):
+        with self.assertRaises(errors.StructuredValidationError) as context:
+            self.validator.validate(self.user_data)
+        self.assertEqual(str(self.validator.collect_errors(self.user_data)[0]), str(context.exception))
+
+    def test_collecting_stops_at_error_cap(self):
+        self.assertEqual(len(self.validator.collect_errors(self.user_data, max_errors=1)), 1)
+
+    def test_no_errors_for_proper_data(self):
+        self.assertEqual(self.validator.collect_errors(deepcopy(tests.utils.example_collection_user_data)), [])
+        self.assertEqual(self.validator.collect_errors(self.user_data, only=['posts/[2]']), [])
+
+    def test_root_and_free_content_errors_are_collected(self):
+        self.assertEqual(self.validator.collect_errors([])[0].path, ())
+        validator = tests.utils.UserWithKeyPatternAttributesSchema().get_validator()
+        data = deepcopy(tests.utils.example_free_content_user_data)
+        data['attributes'].update({'count_posts': 'many', 'flag-active': 1})
+        collected = validator.collect_errors(data)
+        self.assertEqual([e.path for e in collected], [('attributes', 'count_posts'), ('attributes', 'flag-active')])
+        self.assertEqual(collected[1].expected_type, bool)
+
+    def test_limits_abort_collecting(self):
+        limited = self.validator.limited(validators.ValidationLimits(max_collection_length=1))
+        with self.assertRaises(errors.ValidationLimitExceeded):
+            limited.collect_errors(self.user_data)
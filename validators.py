@@ -1,11 +1,274 @@
-from errors import AdapterValidationError, UnexpectedMappingElement
+import collections
+import copy
+import re
+import threading
+import time
+import weakref
+
+import errors
+import metrics
+from errors import AdapterValidationError, FreeContentKey, StructuredValidationError, UnexpectedMappingElement, \
+    ValidationLimitExceeded
+
+WHOLE_SUBTREE = None
+ANY_KEY = '*'
+# selector sets come from clients, so only this many validators built for them are kept per schema validator
+SELECTED_VALIDATORS_CACHE_SIZE = 128
+
+
+_shared_validators = weakref.WeakValueDictionary()
+
+
+def _freeze_validator_param(value):
+    if isinstance(value, dict):
+        return dict, tuple((k, _freeze_validator_param(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple, tuple(_freeze_validator_param(v) for v in value)
+    return value
+
+
+def get_shared_validator(validator_class, **params):
+    # identical subtrees are built once and shared, child validators are keyed by identity
+    # because they are shared themselves, so schemas build a DAG of validators instead of a tree
+    key = (validator_class, tuple((k, _freeze_validator_param(v)) for k, v in sorted(params.items())))
+    try:
+        validator = _shared_validators.get(key)
+    except TypeError:
+        return validator_class(**params)
+    if validator is None:
+        validator = validator_class(**params)
+        _shared_validators[key] = validator
+    return validator
+
+
+def build_selector_tree(selectors):
+    # 'data/*/attributes/title' -> {'data': {'*': {'attributes': {'title': {None: True}}}}}
+    tree = {}
+    for selector in selectors:
+        node = tree
+        for segment in [s for s in selector.split('/') if s]:
+            if WHOLE_SUBTREE in node:
+                break
+            node = node.setdefault(segment, {})
+        else:
+            node.clear()
+            node[WHOLE_SUBTREE] = True
+    return tree
+
+
+def merge_selector_trees(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if WHOLE_SUBTREE in first or WHOLE_SUBTREE in second:
+        return {WHOLE_SUBTREE: True}
+    merged = dict(first)
+    for k, v in second.items():
+        merged[k] = merge_selector_trees(merged.get(k), v)
+    return merged
+
+
+def get_child_selector_tree(tree, name):
+    return merge_selector_trees(tree.get(name), tree.get(ANY_KEY))
+
+
+def select_child_validators(child_validators, tree):
+    selected = []
+    for child_validator in child_validators:
+        child_tree = get_child_selector_tree(tree, child_validator.name)
+        if child_tree is not None:
+            selected.append(child_validator.select(child_tree))
+    return selected
+
+
+class ChildValidatorsOrdering:
+    # runs child validators ordered by observed failures per second of validation, so cheap and often failing
+    # children run first; with error parity the first error in declaration order is reported as without it
+    REORDER_INTERVAL = 64
+    TIMING_INTERVAL = 16
+
+    def __init__(self, child_validators, error_parity=True):
+        self.error_parity = error_parity
+        self._child_validators = child_validators
+        self._order = list(range(len(child_validators)))
+        self._failures = [0] * len(child_validators)
+        self._seconds = [0.0] * len(child_validators)
+        self._timings = [0] * len(child_validators)
+        self._runs = 0
+
+    @property
+    def ordered_validators(self):
+        return [self._child_validators[index] for index in self._order]
+
+    def validate(self, data, error_path=None):
+        self._runs += 1
+        if self._runs % self.REORDER_INTERVAL == 0:
+            self._reorder()
+        # only some runs are timed, timing every child would cost more than the reordering saves
+        timed = self._runs % self.TIMING_INTERVAL == 0
+        order = self._order
+        for position, index in enumerate(order):
+            try:
+                if timed:
+                    started = time.perf_counter()
+                    self._child_validators[index].validate(data, error_path)
+                    self._seconds[index] += time.perf_counter() - started
+                    self._timings[index] += 1
+                else:
+                    self._child_validators[index].validate(data, error_path)
+            except AdapterValidationError:
+                self._failures[index] += 1
+                if self.error_parity:
+                    self._validate_declared_before(data, error_path, order[position + 1:], index)
+                raise
+
+    def _validate_declared_before(self, data, error_path, not_run, failed_index):
+        # children are independent of each other, so running the skipped ones declared earlier is enough
+        for index in sorted(i for i in not_run if i < failed_index):
+            try:
+                self._child_validators[index].validate(data, error_path)
+            except AdapterValidationError:
+                self._failures[index] += 1
+                raise
+
+    def _reorder(self):
+        def get_score(index):
+            cost = self._seconds[index] / self._timings[index] if self._timings[index] else 0.0
+            return self._failures[index] / max(cost, 1e-9)
+
+        self._order = sorted(range(len(self._child_validators)), key=lambda index: (-get_score(index), index))
+
+
+class ValidationLimits:
+    # limits of a single validation, enforced while validating; counters of a validation are kept per thread
+    TIME_CHECK_INTERVAL = 256
+
+    def __init__(self, max_depth=None, max_collection_length=None, max_free_content_keys=None, max_nodes=None,
+                 time_budget=None):
+        self.max_depth = max_depth
+        self.max_collection_length = max_collection_length
+        self.max_free_content_keys = max_free_content_keys
+        self.max_nodes = max_nodes
+        self.time_budget = time_budget
+        self._state = threading.local()
+
+    def start(self):
+        self._state.nodes = 0
+        self._state.deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+
+    def check_depth(self, error_path):
+        if self.max_depth is not None and len(error_path) > self.max_depth:
+            raise ValidationLimitExceeded('Maximum depth of %s exceeded for key "%s"' %
+                                          (self.max_depth, "/".join(error_path)), 'max_depth',
+                                          get_path_tuple(error_path))
+
+    def check_collection_length(self, error_path, length):
+        if self.max_collection_length is not None and length > self.max_collection_length:
+            raise ValidationLimitExceeded('Maximum collection length of %s exceeded for key "%s"' %
+                                          (self.max_collection_length, "/".join(error_path)), 'max_collection_length',
+                                          get_path_tuple(error_path))
+
+    def check_free_content_keys(self, error_path, count):
+        if self.max_free_content_keys is not None and count > self.max_free_content_keys:
+            raise ValidationLimitExceeded('Maximum number of free content keys of %s exceeded for key "%s"' %
+                                          (self.max_free_content_keys, "/".join(error_path)), 'max_free_content_keys',
+                                          get_path_tuple(error_path))
+
+    def visit(self, error_path, count=1):
+        # every validated value is a node, the clock is read only every TIME_CHECK_INTERVAL nodes
+        state = self._state
+        try:
+            previous = state.nodes
+        except AttributeError:
+            self.start()
+            previous = 0
+        nodes = state.nodes = previous + count
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            raise ValidationLimitExceeded('Maximum number of nodes of %s exceeded for key "%s"' %
+                                          (self.max_nodes, "/".join(error_path or [])), 'max_nodes',
+                                          get_path_tuple(error_path))
+        if state.deadline is not None and (nodes // self.TIME_CHECK_INTERVAL != previous // self.TIME_CHECK_INTERVAL) \
+                and time.perf_counter() > state.deadline:
+            raise ValidationLimitExceeded('Time budget of %ss exceeded for key "%s"' %
+                                          (self.time_budget, "/".join(error_path or [])), 'time_budget',
+                                          get_path_tuple(error_path))
+
+
+class _ErrorCapReached(Exception):
+    pass
+
+
+class ErrorCollector:
+    # errors of a single validation, kept per thread; reaching the cap stops the validation
+    def __init__(self):
+        self._state = threading.local()
+
+    def start(self, max_errors=None):
+        self._state.errors = []
+        self._state.max_errors = max_errors
+
+    @property
+    def errors(self):
+        return self._state.errors
+
+    def add(self, error):
+        state = self._state
+        state.errors.append(error)
+        if state.max_errors is not None and len(state.errors) >= state.max_errors:
+            raise _ErrorCapReached()
+
+    def collect(self, validate, *args):
+        try:
+            validate(*args)
+        except ValidationLimitExceeded:
+            raise
+        except AdapterValidationError as e:
+            self.add(e)
+
+    def validate_children(self, child_validators, data, error_path=None):
+        for child_validator in child_validators:
+            self.collect(child_validator.validate, data, error_path)
+
+
+def get_mapping_type(raw_value, mapping):
+    value_type = type(raw_value)
+    if value_type in mapping:
+        return value_type
+    # lazily decoded and copy-on-write values are mapped as the plain containers they stand for
+    if isinstance(raw_value, dict):
+        return dict
+    if isinstance(raw_value, list):
+        return list
+    return value_type
+
+
+def get_path_tuple(error_path, name=None):
+    path = []
+    for segment in (error_path or []) + [name] if name is not None else error_path or []:
+        # collection items are named "[index]" by the collection validator
+        if isinstance(segment, str) and segment.startswith('[') and segment.endswith(']') and segment[1:-1].isdigit():
+            segment = int(segment[1:-1])
+        path.append(segment)
+    return tuple(path)
+
+
+def mark_free_content_key(error, position):
+    # free content keys are marked only in paths of the errors met, marking every key validated would cost
+    # every validation
+    path = getattr(error, 'path', None)
+    if path is not None and len(path) > position and type(path[position]) is str:
+        error.path = path[:position] + (FreeContentKey(path[position]),) + path[position + 1:]
 
 
 class AttributeValidator:
+    _limits = None
+    _collector = None
+
     def __init__(self, data_type, required, required_with, name=None):
         self._data_type = data_type
         self._required = required
-        self._required_with = required_with
+        self._required_with = tuple(required_with) if required_with else ()
         self._name = name
 
     @property
@@ -16,42 +279,59 @@ class AttributeValidator:
     def name(self, name):
         self._name = name
 
-    def validate(self, parent_data, error_path=None):
-        _, error_path_str = self._generate_error_path_pair(error_path)
+    def validate(self, parent_data, error_path=None, name=None):
+        # name is given for validators shared between keys, e.g. collection items and mapping values,
+        # error path strings are joined only for raised errors, joining them for every node is quadratic in depth
+        name = self._name if name is None else name
 
-        if not isinstance(self._name, str):
-            raise AdapterValidationError('Incorrect key type "%s"' % error_path_str)
+        if not isinstance(name, str):
+            raise self._create_error('Incorrect key type "%(path)s"', errors.INCORRECT_KEY_TYPE, error_path, name,
+                                     str, type(name))
 
-        raw_value = self._get_raw_value_from_parent_data(parent_data)
+        raw_value = self._get_raw_value_from_parent_data(parent_data, name)
         if self._required and raw_value is None:
-            raise AdapterValidationError('Missing key "%s"' % error_path_str)
+            raise self._create_error('Missing key "%(path)s"', errors.MISSING_KEY, error_path, name, self._data_type)
 
         if raw_value is not None and not isinstance(raw_value, self._data_type):
-            raise AdapterValidationError('Incorrect data type for key "%s"' % error_path_str)
+            raise self._create_error('Incorrect data type for key "%(path)s"', errors.INCORRECT_TYPE, error_path, name,
+                                     self._data_type, type(raw_value))
 
         if self._required and not raw_value:
-            raise AdapterValidationError('Empty value for key "%s"' % error_path_str)
+            raise self._create_error('Empty value for key "%(path)s"', errors.EMPTY_VALUE, error_path, name,
+                                     self._data_type, type(raw_value))
 
         if raw_value is None:
             return
 
-        required_with = set(self._required_with)
-        for k, _ in parent_data.items():
-            if k in required_with:
-                required_with.remove(k)
-        if required_with:
-            s = 'Attribute "%s" required together with "%s"' % (error_path_str, ", ".join([k for k in self._required_with]))
-            raise AdapterValidationError(s)
+        for k in self._required_with:
+            if k not in parent_data:
+                raise self._create_error('Attribute "%(path)s" required together with "%(names)s"', errors.REQUIRED_WITH,
+                                         error_path, name, names=", ".join(self._required_with))
+
+    def _create_error(self, message, kind, error_path, name, expected_type=None, actual_type=None,
+                      **message_params):
+        message_params['path'] = self._generate_error_path_str(error_path, name)
+        return StructuredValidationError(message % message_params, kind, get_path_tuple(error_path, name),
+                                         expected_type, actual_type)
+
+    def select(self, tree):
+        return self
+
+    def copy_subtree(self, configure):
+        return self
+
+    def _get_raw_value_from_parent_data(self, parent_data, name=None):
+        return parent_data.get(self._name if name is None else name, None)
 
-    def _get_raw_value_from_parent_data(self, parent_data):
-        return parent_data.get(self._name, None)
+    def _generate_error_path_str(self, error_path=None, name=None):
+        name = self._name if name is None else name
+        return "/".join(error_path) + "/" + str(name) if error_path else str(name)
 
-    def _generate_error_path_pair(self, error_path=None):
-        if not error_path:
-            error_path = []
-        error_path_str = "/".join(error_path) + "/" + str(self._name) if len(error_path) > 0 else str(self._name)
-        error_path = error_path + [str(self.name)]
-        return error_path, error_path_str
+    def _generate_error_path(self, error_path=None, name=None):
+        name = self._name if name is None else name
+        if not isinstance(name, str):
+            name = str(name)
+        return error_path + [name] if error_path else [name]
 
 
 class CompoundedAttributeValidator(AttributeValidator):
@@ -59,67 +339,327 @@ class CompoundedAttributeValidator(AttributeValidator):
         kwargs.pop('data_type', None)
         super().__init__(data_type=dict, **kwargs)
         self._child_validators = child_validators
+        self._ordering = None
 
-    def validate(self, parent_data, error_path=None):
-        super().validate(parent_data, error_path)
-        error_path, _ = self._generate_error_path_pair(error_path)
+    def validate(self, parent_data, error_path=None, name=None):
+        super().validate(parent_data, error_path, name)
+        error_path = self._generate_error_path(error_path, name)
 
-        raw_value = self._get_raw_value_from_parent_data(parent_data)
+        raw_value = self._get_raw_value_from_parent_data(parent_data, name)
         if raw_value is None:
             return
+        if self._limits is not None:
+            self._limits.check_depth(error_path)
+            self._limits.visit(error_path, len(self._child_validators))
+        if self._collector is not None:
+            return self._collector.validate_children(self._child_validators, raw_value, error_path)
+        if self._ordering is not None:
+            return self._ordering.validate(raw_value, error_path)
         for child_validator in self._child_validators:
             child_validator.validate(raw_value, error_path)
 
+    def select(self, tree):
+        if WHOLE_SUBTREE in tree:
+            return self
+        selected = copy.copy(self)
+        selected._child_validators = select_child_validators(self._child_validators, tree)
+        if self._ordering is not None:
+            selected._ordering = ChildValidatorsOrdering(selected._child_validators, self._ordering.error_parity)
+        return selected
+
+    def copy_subtree(self, configure):
+        # validators are shared between schemas, so state of a validator tree (ordering, limits) lives in
+        # a copy of it; configure is applied to every copied node having child validators
+        copied = copy.copy(self)
+        copied._child_validators = [child.copy_subtree(configure) for child in self._child_validators]
+        if self._ordering is not None:
+            copied._ordering = ChildValidatorsOrdering(copied._child_validators, self._ordering.error_parity)
+        configure(copied)
+        return copied
+
 
 class MappingValidationMixin(object):
     def __init__(self, mapping, **kwargs):
         super().__init__(**kwargs)
         self._mapping = mapping
 
-    def validate_against_mapping(self, raw_value, error_path_str):
-        if type(raw_value) not in self._mapping:
-            raise AdapterValidationError('Incorrect data type for key "%s"' % error_path_str)
+    def validate_against_mapping(self, raw_value, error_path, name, mapping=None):
+        mapping = self._mapping if mapping is None else mapping
+        if get_mapping_type(raw_value, mapping) not in mapping:
+            raise self._create_error('Incorrect data type for key "%(path)s"', errors.INCORRECT_TYPE, error_path, name,
+                                     tuple(mapping), type(raw_value))
 
-    def get_validator_instance(self, raw_value):
-        validator_instance = self._mapping[type(raw_value)]
+    def get_validator_instance(self, raw_value, mapping=None):
+        mapping = self._mapping if mapping is None else mapping
+        validator_instance = mapping[get_mapping_type(raw_value, mapping)]
         if not isinstance(validator_instance, AttributeValidator):
             raise UnexpectedMappingElement('Values in mapping must be instances of AttributeValidator type')
         return validator_instance
 
+    def select_mapping(self, tree):
+        return {k: v.select(tree) for k, v in self._mapping.items()}
+
+    def copy_mapping_subtrees(self, mapping, configure):
+        if mapping is None:
+            return None
+        return {k: v.copy_subtree(configure) for k, v in mapping.items()}
+
+
+class KeyPrefix:
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def __eq__(self, other):
+        return isinstance(other, KeyPrefix) and other.prefix == self.prefix
+
+    def __hash__(self):
+        return hash((KeyPrefix, self.prefix))
+
+    @property
+    def pattern(self):
+        return re.escape(self.prefix) + '.*'
+
+
+_SCOPED_REGEX_FLAGS = ((re.ASCII, 'a'), (re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'),
+                       (re.VERBOSE, 'x'))
+_GLOBAL_REGEX_FLAGS_RE = re.compile(r'\(\?[aiLmsux]+\)')
+
+
+class KeyPatternMatcher:
+    # patterns without groups are combined into one regex, the name of the matched group tells which pattern won;
+    # patterns with their own groups or backreferences, or starting with global inline flags, would break
+    # the combined regex, so they are matched one by one
+    def __init__(self, patterns):
+        alternatives = []
+        self._separate_patterns = []
+        for index, pattern in enumerate(patterns):
+            flags = ''
+            if isinstance(pattern, re.Pattern):
+                flags = ''.join(f for flag, f in _SCOPED_REGEX_FLAGS if pattern.flags & flag)
+                compiled = pattern
+                pattern = pattern.pattern
+            elif isinstance(pattern, KeyPrefix):
+                flags = 's'
+                pattern = pattern.pattern
+                compiled = re.compile(pattern, re.DOTALL)
+            else:
+                compiled = re.compile(pattern)
+            if compiled.groups or _GLOBAL_REGEX_FLAGS_RE.match(pattern):
+                self._separate_patterns.append((index, compiled))
+                continue
+            alternatives.append('(?P<p%d>(?%s:%s))' % (index, flags, pattern) if flags else '(?P<p%d>%s)' % (index, pattern))
+        self._combined = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def match(self, key):
+        # the first matching pattern in the declared order wins
+        pattern_index = None
+        if self._combined is not None:
+            match = self._combined.fullmatch(key)
+            if match:
+                pattern_index = int(match.lastgroup[1:])
+        for index, compiled in self._separate_patterns:
+            if pattern_index is not None and index > pattern_index:
+                break
+            if compiled.fullmatch(key):
+                return index
+        return pattern_index
+
+
+def compile_key_patterns(patterns):
+    return KeyPatternMatcher(patterns)
+
 
 class FreeContentCompoundedAttributeValidator(MappingValidationMixin, CompoundedAttributeValidator):
-    def validate(self, parent_data, error_path=None):
-        super().validate(parent_data, error_path)
+    KEY_PATTERN_CACHE_SIZE = 4096
 
-        error_path, error_path_str = self._generate_error_path_pair(error_path)
-        raw_value = self._get_raw_value_from_parent_data(parent_data)
+    def __init__(self, key_patterns=None, **kwargs):
+        super().__init__(**kwargs)
+        self._child_attributes_names = frozenset(child.name for child in self._child_validators)
+        self._key_mappings = {}
+        self._key_validators = {}
+        key_patterns = list(key_patterns.items() if isinstance(key_patterns, dict) else key_patterns or [])
+        self._key_pattern_matcher = compile_key_patterns([p for p, _ in key_patterns]) if key_patterns else None
+        self._key_pattern_validators = [v for _, v in key_patterns]
+        self._key_pattern_cache = {}
+
+    def validate(self, parent_data, error_path=None, name=None):
+        super().validate(parent_data, error_path, name)
+
+        error_path = self._generate_error_path(error_path, name)
+        raw_value = self._get_raw_value_from_parent_data(parent_data, name)
         if raw_value is None:
             return
-        child_attributes_names = {child.name for child in self._child_validators}
-        for k, v in raw_value.items():
-            if k not in child_attributes_names:
-                self.validate_against_mapping(v, error_path_str + '/' + str(k))
-                validator_instance = self.get_validator_instance(v)
-                validator_instance.name = k
-                validator_instance.validate(raw_value, error_path)
+        child_attributes_names = self._child_attributes_names
+        limits = self._limits
+        if limits is not None:
+            own_keys = sum(1 for child_name in child_attributes_names if child_name in raw_value)
+            limits.check_free_content_keys(error_path, len(raw_value) - own_keys)
+        collector = self._collector
+        first_collected = len(collector.errors) if collector is not None else None
+        try:
+            for k, v in raw_value.items():
+                if limits is not None:
+                    limits.visit(error_path)
+                if k in child_attributes_names:
+                    continue
+                if collector is not None:
+                    collector.collect(self._validate_free_content_key, raw_value, error_path, k, v)
+                    continue
+                validator_instance = self._get_free_content_validator(k, v, error_path)
+                if validator_instance is None:
+                    continue
+                validator_instance.validate(raw_value, error_path, k)
+        except AdapterValidationError as e:
+            mark_free_content_key(e, len(error_path))
+            raise
+        finally:
+            if collector is not None:
+                for collected in collector.errors[first_collected:]:
+                    mark_free_content_key(collected, len(error_path))
+
+    def _validate_free_content_key(self, raw_value, error_path, k, v):
+        validator_instance = self._get_free_content_validator(k, v, error_path)
+        if validator_instance is not None:
+            validator_instance.validate(raw_value, error_path, k)
+
+    def _get_free_content_validator(self, k, v, error_path):
+        if k in self._key_validators:
+            return self._key_validators[k]
+        if k in self._key_mappings:
+            mapping = self._key_mappings[k]
+        else:
+            pattern_index = self._match_key_pattern(k)
+            if pattern_index is not None:
+                return self._key_pattern_validators[pattern_index]
+            mapping = self._mapping
+            if mapping is None:
+                return None
+        self.validate_against_mapping(v, error_path, k, mapping)
+        return self.get_validator_instance(v, mapping)
+
+    def _match_key_pattern(self, k):
+        if self._key_pattern_matcher is None or not isinstance(k, str):
+            return None
+        try:
+            return self._key_pattern_cache[k]
+        except KeyError:
+            pass
+        pattern_index = self._key_pattern_matcher.match(k)
+        if len(self._key_pattern_cache) < self.KEY_PATTERN_CACHE_SIZE:
+            self._key_pattern_cache[k] = pattern_index
+        return pattern_index
+
+    def select(self, tree):
+        selected = super().select(tree)
+        if selected is self:
+            return self
+        # free content keys are not known up front, so validators are selected per named key and for the rest
+        selected._key_mappings = {}
+        selected._key_validators = {}
+        for k in tree:
+            if k in (WHOLE_SUBTREE, ANY_KEY) or k in self._child_attributes_names:
+                continue
+            key_tree = get_child_selector_tree(tree, k)
+            pattern_index = self._match_key_pattern(k)
+            if pattern_index is not None:
+                selected._key_validators[k] = self._key_pattern_validators[pattern_index].select(key_tree)
+            else:
+                selected._key_mappings[k] = self.select_mapping(key_tree)
+        if ANY_KEY in tree:
+            selected._mapping = self.select_mapping(tree[ANY_KEY])
+            selected._key_pattern_validators = [v.select(tree[ANY_KEY]) for v in self._key_pattern_validators]
+        else:
+            selected._mapping = None
+            selected._key_pattern_matcher = None
+        return selected
+
+    def copy_subtree(self, configure):
+        copied = super().copy_subtree(configure)
+        copied._mapping = self.copy_mapping_subtrees(self._mapping, configure)
+        copied._key_mappings = {k: self.copy_mapping_subtrees(m, configure) for k, m in self._key_mappings.items()}
+        copied._key_validators = {k: v.copy_subtree(configure) for k, v in self._key_validators.items()}
+        copied._key_pattern_validators = [v.copy_subtree(configure) for v in self._key_pattern_validators]
+        return copied
 
 
 class FreeTypeAttributeValidator(MappingValidationMixin, AttributeValidator):
-    def __init__(self, **kwargs):
+    def __init__(self, nullable=False, **kwargs):
         kwargs.pop('data_type', None)
         super().__init__(data_type=object, **kwargs)
+        self._nullable = nullable
 
-    def validate(self, parent_data, error_path=None):
-        super().validate(parent_data, error_path)
-
-        _, error_path_str = self._generate_error_path_pair(error_path)
-        raw_value = self._get_raw_value_from_parent_data(parent_data)
+    def validate(self, parent_data, error_path=None, name=None):
+        name = self._name if name is None else name
+        raw_value = self._get_raw_value_from_parent_data(parent_data, name)
+        if not (self._nullable and not raw_value and isinstance(name, str) and name in parent_data):
+            super().validate(parent_data, error_path, name)
         if raw_value is None:
             return
-        self.validate_against_mapping(raw_value, error_path_str)
+        self.validate_against_mapping(raw_value, error_path, name)
         validator_instance = self.get_validator_instance(raw_value)
-        validator_instance.name = self._name
-        validator_instance.validate(parent_data, error_path)
+        validator_instance.validate(parent_data, error_path, name)
+
+    def select(self, tree):
+        if WHOLE_SUBTREE in tree:
+            return self
+        # type dispatch does not consume a path segment
+        selected = copy.copy(self)
+        selected._mapping = self.select_mapping(tree)
+        return selected
+
+    def copy_subtree(self, configure):
+        copied = copy.copy(self)
+        copied._mapping = self.copy_mapping_subtrees(self._mapping, configure)
+        configure(copied)
+        return copied
+
+
+class DiscriminatedAttributeValidator(AttributeValidator):
+    def __init__(self, discriminator, mapping, default=None, **kwargs):
+        kwargs.pop('data_type', None)
+        super().__init__(data_type=dict, **kwargs)
+        self._discriminator = discriminator
+        self._mapping = mapping
+        self._default = default
+
+    def validate(self, parent_data, error_path=None, name=None):
+        super().validate(parent_data, error_path, name)
+
+        name = self._name if name is None else name
+        raw_value = self._get_raw_value_from_parent_data(parent_data, name)
+        if raw_value is None:
+            return
+        validator_instance = self.get_validator_instance(raw_value, self._generate_error_path(error_path, name))
+        validator_instance.validate(parent_data, error_path, name)
+
+    def get_validator_instance(self, raw_value, error_path):
+        tag = raw_value.get(self._discriminator, None)
+        if tag is None:
+            raise self._create_error('Missing key "%(path)s"', errors.MISSING_KEY, error_path, self._discriminator)
+        if isinstance(tag, (dict, list)):
+            raise self._create_error('Incorrect data type for key "%(path)s"', errors.INCORRECT_TYPE, error_path,
+                                     self._discriminator, None, type(tag))
+        validator_instance = self._mapping.get(tag, self._default)
+        if validator_instance is None:
+            raise self._create_error('Unknown value for key "%(path)s": "%(tag)s"', errors.UNKNOWN_DISCRIMINATOR,
+                                     error_path, self._discriminator, None, type(tag), tag=tag)
+        return validator_instance
+
+    def select(self, tree):
+        if WHOLE_SUBTREE in tree:
+            return self
+        # dispatch does not consume a path segment
+        selected = copy.copy(self)
+        selected._mapping = {k: v.select(tree) for k, v in self._mapping.items()}
+        selected._default = self._default.select(tree) if self._default is not None else None
+        return selected
+
+    def copy_subtree(self, configure):
+        copied = copy.copy(self)
+        copied._mapping = {k: v.copy_subtree(configure) for k, v in self._mapping.items()}
+        copied._default = self._default.copy_subtree(configure) if self._default is not None else None
+        configure(copied)
+        return copied
 
 
 class CollectionAttributeValidator(AttributeValidator):
@@ -127,29 +667,178 @@ class CollectionAttributeValidator(AttributeValidator):
         kwargs.pop('data_type', None)
         super().__init__(data_type=list, **kwargs)
         self._inner_validator = inner_validator
+        self._index_validators = {}
 
-    def validate(self, parent_data, error_path=None):
-        super().validate(parent_data, error_path)
+    def validate(self, parent_data, error_path=None, name=None):
+        super().validate(parent_data, error_path, name)
 
-        error_path, _ = self._generate_error_path_pair(error_path)
-        raw_value = self._get_raw_value_from_parent_data(parent_data)
+        error_path = self._generate_error_path(error_path, name)
+        raw_value = self._get_raw_value_from_parent_data(parent_data, name)
         if raw_value is None:
             return
+        limits = self._limits
+        if limits is not None:
+            limits.check_depth(error_path)
+            limits.check_collection_length(error_path, len(raw_value))
         for index, v in enumerate(raw_value):
-            self._inner_validator.name = "[%s]" % str(index)
+            if limits is not None:
+                limits.visit(error_path)
+            inner_validator = self._index_validators.get(index, self._inner_validator)
+            if inner_validator is None:
+                continue
+            item_name = "[%s]" % str(index)
             # this is hack for preserving the same validator interface as in whole application
             collection_item_parent_data = {
-                "[%s]" % str(index): v
+                item_name: v
             }
-            self._inner_validator.validate(collection_item_parent_data, error_path)
+            if self._collector is not None:
+                self._collector.collect(inner_validator.validate, collection_item_parent_data, error_path, item_name)
+                continue
+            inner_validator.validate(collection_item_parent_data, error_path, item_name)
+
+    def select(self, tree):
+        if WHOLE_SUBTREE in tree:
+            return self
+        index_trees = {}
+        for k, v in tree.items():
+            index = self._parse_selector_index(k)
+            if index is not None:
+                index_trees[index] = merge_selector_trees(index_trees.get(index), v)
+
+        selected = copy.copy(self)
+        selected._index_validators = {}
+        for index, index_tree in index_trees.items():
+            index_tree = merge_selector_trees(index_tree, tree.get(ANY_KEY))
+            selected._index_validators[index] = self._inner_validator.select(index_tree)
+        selected._inner_validator = self._inner_validator.select(tree[ANY_KEY]) if ANY_KEY in tree else None
+        return selected
+
+    def copy_subtree(self, configure):
+        copied = copy.copy(self)
+        copied._index_validators = {i: v.copy_subtree(configure) for i, v in self._index_validators.items()}
+        copied._inner_validator = self._inner_validator.copy_subtree(configure) \
+            if self._inner_validator is not None else None
+        configure(copied)
+        return copied
+
+    @staticmethod
+    def _parse_selector_index(segment):
+        if not isinstance(segment, str):
+            return None
+        if segment.startswith('[') and segment.endswith(']'):
+            segment = segment[1:-1]
+        return int(segment) if segment.isdigit() else None
 
 
 class SchemaValidator:
-    def __init__(self, child_validators):
-        self._child_validators = child_validators
+    _limits = None
+    _collector = None
+    _collecting_validator = None
 
-    def validate(self, data):
+    def __init__(self, child_validators, schema_name=None):
+        self._child_validators = child_validators
+        self._selected_validators = collections.OrderedDict()
+        self._selected_validators_lock = threading.Lock()
+        self._metrics_labels = (('schema', schema_name or self.__class__.__name__),)
+        self._ordering = None
+
+    def select(self, tree):
+        selected = copy.copy(self)
+        selected._child_validators = select_child_validators(self._child_validators, tree)
+        selected._selected_validators = collections.OrderedDict()
+        selected._selected_validators_lock = threading.Lock()
+        selected._collecting_validator = None
+        if self._ordering is not None:
+            selected._ordering = ChildValidatorsOrdering(selected._child_validators, self._ordering.error_parity)
+        return selected
+
+    def copy_subtree(self, configure):
+        copied = copy.copy(self)
+        copied._child_validators = [child.copy_subtree(configure) for child in self._child_validators]
+        copied._selected_validators = collections.OrderedDict()
+        copied._selected_validators_lock = threading.Lock()
+        copied._collecting_validator = None
+        if self._ordering is not None:
+            copied._ordering = ChildValidatorsOrdering(copied._child_validators, self._ordering.error_parity)
+        configure(copied)
+        return copied
+
+    def adaptive(self, error_parity=True):
+        # returns a validator reordering its checks by observed failures, error_parity keeps reported errors
+        # the same as of this validator at the cost of running skipped checks after a failure
+        def enable_ordering(validator):
+            if isinstance(validator, (CompoundedAttributeValidator, SchemaValidator)):
+                validator._ordering = ChildValidatorsOrdering(validator._child_validators, error_parity)
+
+        return self.copy_subtree(enable_ordering)
+
+    def limited(self, limits):
+        # returns a validator aborting with ValidationLimitExceeded once the given ValidationLimits are exceeded
+        def set_limits(validator):
+            validator._limits = limits
+
+        return self.copy_subtree(set_limits)
+
+    def collect_errors(self, data, only=None, max_errors=None):
+        # validates all the data instead of stopping at the first error and returns StructuredValidationErrors,
+        # at most max_errors of them; exceeded validation limits are raised as usual
+        if only is not None:
+            return self.get_selected_validator(only).collect_errors(data, max_errors=max_errors)
+        collecting_validator = self._collecting_validator
+        if collecting_validator is None:
+            collector = ErrorCollector()
+
+            def set_collector(validator):
+                validator._collector = collector
+
+            collecting_validator = self._collecting_validator = self.copy_subtree(set_collector)
+        collector = collecting_validator._collector
+        collector.start(max_errors)
+        try:
+            collector.collect(collecting_validator._validate, data)
+        except _ErrorCapReached:
+            pass
+        return collector.errors
+
+    def get_selected_validator(self, only):
+        # validators for a selector set are built once and reused, the least recently used ones are dropped
+        key = frozenset(only)
+        with self._selected_validators_lock:
+            selected = self._selected_validators.get(key)
+            if selected is not None:
+                self._selected_validators.move_to_end(key)
+                return selected
+        selected = self.select(build_selector_tree(only))
+        with self._selected_validators_lock:
+            self._selected_validators[key] = selected
+            if len(self._selected_validators) > SELECTED_VALIDATORS_CACHE_SIZE:
+                self._selected_validators.popitem(last=False)
+        return selected
+
+    def validate(self, data, only=None):
+        metrics_registry = metrics.registry
+        if metrics_registry is None:
+            return self._validate(data, only)
+
+        started = time.perf_counter()
+        try:
+            self._validate(data, only)
+        except AdapterValidationError as e:
+            metrics.record_validation(metrics_registry, time.perf_counter() - started, self._metrics_labels, e)
+            raise
+        metrics.record_validation(metrics_registry, time.perf_counter() - started, self._metrics_labels)
+
+    def _validate(self, data, only=None):
+        if only is not None:
+            return self.get_selected_validator(only)._validate(data)
         if type(data) != dict:
-            raise AdapterValidationError('Incorrect root data type')
+            raise StructuredValidationError('Incorrect root data type', errors.INCORRECT_TYPE, (), dict, type(data))
+        if self._limits is not None:
+            self._limits.start()
+            self._limits.visit(None, len(self._child_validators))
+        if self._collector is not None:
+            return self._collector.validate_children(self._child_validators, data)
+        if self._ordering is not None:
+            return self._ordering.validate(data)
         for child_validator in self._child_validators:
             child_validator.validate(data)